@@ -1,23 +1,13 @@
-import sqlite3
-import functools
+from db_pool import with_pooled_connection
 
 def with_db_connection(func):
-    """Decorator to open and close a database connection automatically."""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+    """Decorator to lend a pooled database connection automatically."""
+    return with_pooled_connection('users.db')(func)
 
 @with_db_connection
 def get_user_by_id(conn, user_id):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    return cursor.fetchone()
+    # Reuses a cursor and the prepared statement across calls
+    return conn.execute_cached("SELECT * FROM users WHERE id = ?", (user_id,), one=True)
 
 # Fetch user by ID with automatic connection handling
 user_id = 1
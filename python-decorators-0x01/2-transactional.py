@@ -1,15 +1,11 @@
-import sqlite3
 import functools
 
+from cache import discard_uncommitted, invalidate_committed, invalidates_cache
+from db_pool import with_pooled_connection
+
 def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('my_database.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+    """Decorator to lend a pooled database connection automatically."""
+    return with_pooled_connection('my_database.db')(func)
 
 def transactional(func):
     @functools.wraps(func)
@@ -17,14 +13,17 @@ def transactional(func):
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
+            invalidate_committed(conn)
             return result
         except Exception:
             conn.rollback()
+            discard_uncommitted(conn)
             raise
     return wrapper
 
-@transactional
 @with_db_connection
+@transactional
+@invalidates_cache
 def update_user_email(conn, user_id, new_email):
     cursor = conn.cursor()
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
@@ -1,17 +1,11 @@
 import time
-import sqlite3
 import functools
 
+from db_pool import with_pooled_connection
+
 def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('example.db')
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
+    """Decorator to lend a pooled database connection automatically."""
+    return with_pooled_connection('example.db')(func)
 
 def retry_on_failure(retries=3, delay=2):
     def decorator(func):
@@ -35,9 +29,7 @@ def retry_on_failure(retries=3, delay=2):
 @retry_on_failure(retries=3, delay=1)
 @with_db_connection
 def fetch_users_with_retry(conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    return cursor.fetchall()
+    return conn.execute_cached("SELECT * FROM users")
 
 users = fetch_users_with_retry()
 print(users)
\ No newline at end of file
@@ -1,31 +1,99 @@
 import time
-import sqlite3 
 import functools
+import threading
 
-query_cache = {}
+from cache import MISSING, TableRecorder, invalidates_cache, query_cache
+from db_pool import get_pool, with_pooled_connection
 
-def cache_query(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Assume the SQL query is always passed as a keyword argument 'query'
-        query = kwargs.get('query')
-        if query in query_cache:
-            return query_cache[query]
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        return result
-    return wrapper
+def cache_query(func=None, *, ttl=None, stale=0, cache=query_cache, connect=None):
+    """
+    Cache a query function's results in `cache`, keyed on the database
+    file, the SQL text and every other argument.
+
+    Entries live for `ttl` seconds (the cache's default when None) and
+    are invalidated when a table the query read is written through an
+    @invalidates_cache function. Concurrent misses on the same key run
+    the query once and share the result. With `stale` seconds, an
+    expired entry is served for that long after expiry while one
+    background thread refreshes it on a connection borrowed from
+    db_pool.get_pool(path), or opened with `connect(path)` if given.
+    Misses check the cache's disk tier, if it has one, before running
+    the query. Usable as @cache_query or @cache_query(ttl=30).
+    """
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl, stale=stale, cache=cache, connect=connect)
 
-def with_db_connection(func):
     @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('example.db')
+    def wrapper(conn, *args, **kwargs):
+        # The SQL query is passed as the keyword argument 'query' or first
+        if 'query' in kwargs:
+            query = kwargs['query']
+            params = (args, {k: v for k, v in kwargs.items() if k != 'query'})
+        else:
+            query = args[0] if args else None
+            params = (args[1:], kwargs)
         try:
+            key = cache.key(conn, query, params)
+        except TypeError:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
+
+        def run(conn, flight):
+            try:
+                since = cache.generation
+                stamp = cache.stamp(key)
+                with TableRecorder(conn) as tables:
+                    result = func(conn, *args, **kwargs)
+                cache.store(key, result, tables.read, ttl, since, stale, stamp)
+                flight.resolve(result)
+                return result
+            except BaseException as e:
+                flight.resolve(error=e)
+                raise
+            finally:
+                cache.finish(key, flight)
+
+        def refresh(flight):
+            try:
+                if connect is None:
+                    pool = get_pool(key[0])
+                    refresh_conn = pool.acquire()
+                    done = functools.partial(pool.release, refresh_conn)
+                else:
+                    refresh_conn = connect(key[0])
+                    done = refresh_conn.close
+            except Exception as e:
+                flight.resolve(error=e)
+                cache.finish(key, flight)
+                cache.refresh_failed()
+                return
+            try:
+                run(refresh_conn, flight)
+            except Exception:
+                cache.refresh_failed()  # Keep serving the stale value until it runs out
+            finally:
+                done()
+
+        result, flight, lead = cache.claim(key)
+        if flight is None:
+            return result
+        if not lead:
+            return flight.wait()
+        if result is MISSING:
+            result = cache.load(key)
+            if result is not MISSING:
+                flight.resolve(result)
+                cache.finish(key, flight)
+                return result
+        if result is not MISSING and not key[0].startswith(':memory:'):
+            threading.Thread(target=refresh, args=(flight,), daemon=True).start()
+            return result
+        return run(conn, flight)
     return wrapper
 
+def with_db_connection(func):
+    """Decorator to lend a pooled database connection automatically."""
+    return with_pooled_connection('example.db')(func)
+
 @with_db_connection
 @cache_query
 def fetch_users_with_cache(conn, query):
@@ -33,8 +101,19 @@ def fetch_users_with_cache(conn, query):
     cursor.execute(query)
     return cursor.fetchall()
 
+@with_db_connection
+@invalidates_cache
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+    conn.commit()
+
 #### First call will cache the result
 users = fetch_users_with_cache(query="SELECT * FROM users")
 
 #### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
\ No newline at end of file
+users_again = fetch_users_with_cache(query="SELECT * FROM users")
+
+#### Writing to users drops the cached result, so the next call re-runs the query
+update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
+users_fresh = fetch_users_with_cache(query="SELECT * FROM users")
@@ -0,0 +1,569 @@
+import os
+import sys
+import time
+import pickle
+import hashlib
+import sqlite3
+import threading
+import functools
+from collections import OrderedDict
+
+# Defaults for the shared query_cache
+MAX_ENTRIES = 1024
+MAX_BYTES = 64 * 1024 * 1024
+TTL = 300.0
+# Side file for the persistent tier of query_cache. Off unless set: its
+# payloads are unpickled, so it must be a file this application owns.
+DISK_PATH = os.getenv('QUERY_CACHE_PATH')
+DISK_MAX_ENTRIES = 10000
+
+MISSING = object()
+
+# Authorizer actions that change a table's contents or shape
+WRITE_ACTIONS = (
+    sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE,
+    sqlite3.SQLITE_DELETE, sqlite3.SQLITE_DROP_TABLE,
+)
+
+
+def database_paths(conn):
+    """Map each attached database name to the file behind it"""
+    paths = {}
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        # In-memory and temp databases belong to this connection alone
+        paths[name] = path or f":memory:{id(conn)}"
+    return paths
+
+
+def freeze(value):
+    """Turn query parameters into something hashable for a cache key"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def source_stamp(path):
+    """
+    Version stamp of a database file: the file change counter from its
+    header plus mtime and size of the file and its WAL, which every
+    committed write changes. PRAGMA data_version would be exact but only
+    compares within one connection, so it cannot validate entries
+    written by an earlier process.
+    """
+    parts = []
+    try:
+        with open(path, 'rb') as f:
+            f.seek(24)  # File change counter, bumped by rollback-journal commits
+            parts.append(f.read(4).hex())
+    except FileNotFoundError:
+        parts.append('-')
+    for name in (path, path + '-wal'):
+        try:
+            st = os.stat(name)
+        except FileNotFoundError:
+            parts.append('-')
+        else:
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+    return '/'.join(parts)
+
+
+def result_size(value):
+    """Rough size in bytes of a result set: the list, its rows and their values"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, (tuple, list, sqlite3.Row)):
+                size += sum(map(sys.getsizeof, row))
+    return size
+
+
+# id(conn) -> TableRecorders active on that connection, innermost last
+_recorders = {}
+
+
+def _authorize(active, action, arg1, arg2, dbname, trigger):
+    for recorder in active:
+        recorder.record(action, arg1, arg2, dbname)
+    return sqlite3.SQLITE_OK
+
+
+class TableRecorder:
+    """
+    Context manager that collects the tables statements read and write.
+
+    Sees every table a statement touches, views and triggers included.
+    Connections with a `table_listeners` list (db_pool's pooled ones)
+    report tables themselves and keep their prepared statements. On any
+    other connection an authorizer is installed, which expires its
+    prepared statements so SQLite prepares (and reports) them again.
+    Tables are (database file, table).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.read = set()
+        self.written = set()
+
+    def __enter__(self):
+        self._paths = database_paths(self.conn)
+        listeners = getattr(self.conn, 'table_listeners', None)
+        if listeners is not None:
+            listeners.append(self)
+            return self
+        active = _recorders.setdefault(id(self.conn), [])
+        active.append(self)
+        self.conn.set_authorizer(functools.partial(_authorize, active))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        listeners = getattr(self.conn, 'table_listeners', None)
+        if listeners is not None:
+            listeners.remove(self)
+            return
+        active = _recorders[id(self.conn)]
+        active.remove(self)
+        if not active:
+            del _recorders[id(self.conn)]
+            self.conn.set_authorizer(None)
+
+    def record(self, action, arg1, arg2, dbname):
+        if action == sqlite3.SQLITE_READ:
+            self.read.add(self._table(dbname, arg1))
+        elif action in WRITE_ACTIONS:
+            self.written.add(self._table(dbname, arg1))
+        elif action == sqlite3.SQLITE_ALTER_TABLE:
+            self.written.add(self._table(arg1, arg2))
+
+    def _table(self, dbname, table):
+        return (self._paths.get(dbname or 'main', dbname), table)
+
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'expires', 'stale_until', 'tables')
+
+    def __init__(self, value, size, expires, stale_until, tables):
+        self.value = value
+        self.size = size
+        self.expires = expires
+        self.stale_until = stale_until
+        self.tables = tables
+
+    def fresh(self, now):
+        return self.expires is None or now < self.expires
+
+
+class Flight:
+    """One in-progress run of a query that other callers can wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = MISSING
+        self.error = None
+
+    def resolve(self, value=MISSING, error=None):
+        self.value = value
+        self.error = error
+        self.done.set()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class DiskCache:
+    """
+    Persistent cache tier: pickled results in a SQLite side file, so a
+    restarted process starts warm.
+
+    Each entry carries the source_stamp() of its database taken before
+    the query ran and is dropped on load once the database has changed.
+    The file is opened on first use and keeps at most `max_entries`
+    entries. Payloads are unpickled, so only point it at a file this
+    application owns.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key BLOB PRIMARY KEY,
+        stamp TEXT NOT NULL,
+        expires REAL,
+        tables BLOB NOT NULL,
+        payload BLOB NOT NULL,
+        stored REAL NOT NULL
+    )
+    """
+    PRUNE_EVERY = 100  # Writes between trims of expired and excess entries
+
+    def __init__(self, path, max_entries=DISK_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(self.SCHEMA)
+        return self._conn
+
+    @staticmethod
+    def digest(key):
+        """Row key for `key`, or None when its arguments cannot be pickled"""
+        try:
+            return hashlib.blake2b(pickle.dumps(key), digest_size=20).digest()
+        except Exception:
+            return None
+
+    def get(self, key, stamp):
+        """Return (value, tables, expires) for `key` if still valid for `stamp`, else None"""
+        digest = self.digest(key)
+        if digest is None:
+            return None
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT stamp, expires, tables, payload FROM entries WHERE key = ?",
+                (digest,)).fetchone()
+            if row is None:
+                return None
+            if row[0] != stamp or (row[1] is not None and row[1] <= time.time()):
+                conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+                conn.commit()
+                return None
+        try:
+            return pickle.loads(row[3]), pickle.loads(row[2]), row[1]
+        except Exception:
+            return None
+
+    def put(self, key, value, tables, expires, stamp):
+        """Persist `value`; keys or results that cannot be pickled are skipped"""
+        digest = self.digest(key)
+        if digest is None:
+            return False
+        try:
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        tables = pickle.dumps(frozenset(tables), pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, stamp, expires, tables, payload, time.time()))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune(conn)
+            conn.commit()
+        return True
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM entries WHERE key NOT IN "
+            "(SELECT key FROM entries ORDER BY stored DESC LIMIT ?)", (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results.
+
+    Holds at most `max_entries` results and about `max_bytes` of them,
+    evicting the least recently used first. Entries expire `ttl` seconds
+    after they are stored (None: never) and are dropped as soon as a
+    table they read is written through invalidate().
+
+    claim() gives callers that miss on the same key at the same time a
+    single Flight to share, so only one of them runs the query. Entries
+    stored with `stale` seconds may be served for that long after they
+    expire while one caller refreshes them.
+
+    With a DiskCache as `disk`, stored results are also written there and
+    misses are looked up there (load()) before running the query.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=TTL,
+                 clock=time.monotonic, disk=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.disk = disk
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self.evictions = self.expirations = self.invalidations = 0
+        self.coalesced = self.stale_hits = self.refresh_errors = 0
+        self.disk_hits = self.disk_misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._keys_by_table = {}
+        self._invalidated = {}  # table -> generation it was last written at
+        self._flights = {}  # key -> Flight of the caller running its query
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, conn, query, params=()):
+        """Cache key for `query` with `params` against conn's main database"""
+        key = (database_paths(conn)['main'], query, freeze(params))
+        hash(key)  # Raise TypeError now for parameters that cannot be keyed
+        return key
+
+    def lookup(self, key):
+        """Return the cached value for `key`, or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            if not entry.fresh(self.clock()):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def claim(self, key):
+        """
+        Look `key` up for a caller that will run the query on a miss.
+
+        Returns (value, flight, lead):
+        - a fresh hit, or a stale one already being refreshed: (value, None, False)
+        - a stale hit nobody is refreshing: (value, flight, True)
+        - a miss another caller is running: (MISSING, flight, False); wait on it
+        - any other miss: (MISSING, flight, True)
+        A caller that leads must resolve the flight and then call finish().
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                now = self.clock()
+                if entry.fresh(now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value, None, False
+                if now < entry.stale_until:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key in self._flights:
+                        return entry.value, None, False
+                    flight = self._flights[key] = Flight()
+                    return entry.value, flight, True
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return MISSING, flight, False
+            flight = self._flights[key] = Flight()
+            return MISSING, flight, True
+
+    def finish(self, key, flight):
+        """Retire the flight a leading caller got from claim()"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def refresh_failed(self):
+        with self._lock:
+            self.refresh_errors += 1
+
+    def stamp(self, key):
+        """Version stamp of key's database for the disk tier, or None"""
+        if self.disk is None or key[0].startswith(':memory:'):
+            return None
+        return source_stamp(key[0])
+
+    def load(self, key):
+        """Return key's value from the disk tier, also caching it in memory, or MISSING"""
+        stamp = self.stamp(key)
+        if stamp is None:
+            return MISSING
+        since = self.generation  # As in a query run: a write from here on wins
+        try:
+            found = self.disk.get(key, stamp)
+        except Exception:  # An unreadable side file only costs the warm start
+            found = None
+        with self._lock:
+            if found is None:
+                self.disk_misses += 1
+                return MISSING
+            self.disk_hits += 1
+        value, tables, expires = found
+        ttl = None if expires is None else max(expires - time.time(), 0)
+        self.store(key, value, tables, ttl, since)
+        return value
+
+    def store(self, key, value, tables=(), ttl=None, since=None, stale=0, stamp=None):
+        """
+        Cache `value` under `key` as depending on `tables`.
+
+        `since` is the generation read before the query ran; if one of
+        its tables was written after that, the value may already be stale
+        and is not stored. With `stamp` (see stamp()), taken before the
+        query ran, the value is written to the disk tier too.
+        """
+        size = result_size(value)
+        ttl = self.ttl if ttl is None else ttl
+        if not self._store(key, value, size, frozenset(tables), ttl, since, stale):
+            return False
+        if stamp is not None and self.disk is not None:
+            expires = None if ttl is None else time.time() + ttl
+            try:
+                self.disk.put(key, value, tables, expires, stamp)
+            except sqlite3.Error:
+                pass  # Still cached in memory
+        return True
+
+    def _store(self, key, value, size, tables, ttl, since, stale):
+        with self._lock:
+            if since is not None and any(
+                    self._invalidated.get(t, -1) > since for t in tables):
+                return False
+            if size > self.max_bytes:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            expires = None if ttl is None else self.clock() + ttl
+            stale_until = None if expires is None else expires + stale
+            self._entries[key] = CacheEntry(value, size, expires, stale_until, tables)
+            self.bytes += size
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def invalidate(self, tables):
+        """Drop every entry that read one of `tables`; returns how many"""
+        dropped = 0
+        with self._lock:
+            self.generation += 1
+            for table in tables:
+                self._invalidated[table] = self.generation
+                for key in self._keys_by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        dropped += 1
+            self.invalidations += dropped
+        return dropped
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_table.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries), 'bytes': self.bytes,
+                'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'expirations': self.expirations,
+                'invalidations': self.invalidations, 'coalesced': self.coalesced,
+                'stale_hits': self.stale_hits, 'refresh_errors': self.refresh_errors,
+                'disk_hits': self.disk_hits, 'disk_misses': self.disk_misses,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        for table in entry.tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+
+query_cache = QueryCache(disk=DiskCache(DISK_PATH) if DISK_PATH else None)
+
+
+# id(conn) -> {id(cache): (cache, tables)} written by @invalidates_cache
+# functions in a transaction that has not committed yet. Tables are merged
+# per cache, so a connection's entry is bounded by the tables it writes.
+_uncommitted = {}
+
+
+def invalidate_committed(conn):
+    """
+    Call right after conn.commit().
+
+    @invalidates_cache drops entries as soon as its function returns,
+    which may be before the commit; a reader in between still sees the
+    old rows and can cache them. This drops entries for those tables
+    once more, now that the write is visible.
+    """
+    for cache, tables in _uncommitted.pop(id(conn), {}).values():
+        cache.invalidate(tables)
+
+
+def discard_uncommitted(conn):
+    """Call right after conn.rollback(): its pending writes never became visible"""
+    _uncommitted.pop(id(conn), None)
+
+
+def invalidates_cache(func=None, *, cache=None):
+    """
+    Decorator for functions that take a connection first and write
+    through it: afterwards, cached results that read any table the
+    function wrote are dropped from `cache` (query_cache by default).
+
+    If the write is still uncommitted, whatever commits it should call
+    invalidate_committed(conn) and whatever rolls it back
+    discard_uncommitted(conn) (transactional and db_pool's release do).
+    Otherwise the tables are invalidated again the next time a decorated
+    function finds the connection outside a transaction.
+    """
+    if func is None:
+        return functools.partial(invalidates_cache, cache=cache)
+
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        target = query_cache if cache is None else cache
+        if not conn.in_transaction:
+            # The transaction that left these behind has ended, maybe
+            # committed; the id may even belong to a new connection
+            invalidate_committed(conn)
+        recorder = TableRecorder(conn)
+        try:
+            with recorder:
+                return func(conn, *args, **kwargs)
+        finally:
+            target.invalidate(recorder.written)
+            if recorder.written and conn.in_transaction:
+                pending = _uncommitted.setdefault(id(conn), {})
+                pending.setdefault(id(target), (target, set()))[1].update(recorder.written)
+    return wrapper
@@ -0,0 +1,339 @@
+import os
+import atexit
+import sqlite3
+import functools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from cache import discard_uncommitted, invalidate_committed
+
+POOL_SIZE = 8
+POOL_TIMEOUT = 30.0
+# Prepared statements sqlite3 keeps per connection (its cached_statements)
+STATEMENT_CACHE_SIZE = 256
+# Applied to every pooled connection when it is opened
+PRAGMAS = {
+    'journal_mode': 'WAL',     # Readers and the writer stop blocking each other
+    'synchronous': 'NORMAL',   # Safe with WAL; fsyncs at checkpoints only
+    'cache_size': -64000,      # 64 MiB page cache per connection
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+class StatementStats:
+    """
+    Hit/miss counters for a connection's prepared-statement cache.
+
+    sqlite3 keeps its LRU of prepared statements private, so this keeps
+    a mirror of it: the last `size` SQL strings prepared, in use order,
+    each with the authorizer actions SQLite reported while preparing it.
+    The mirror holds as long as nothing expires the real statements,
+    which is why pooled connections never change their authorizer.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = self.misses = 0
+        self._recent = OrderedDict()
+
+    def record(self, sql):
+        """Count a use of `sql`; return its prepare-time actions, or None on a miss"""
+        actions = self._recent.get(sql)
+        if actions is None:
+            self.misses += 1
+            return None
+        self._recent.move_to_end(sql)
+        self.hits += 1
+        return actions
+
+    def prepared(self, sql, actions):
+        self._recent[sql] = actions
+        if len(self._recent) > self.size:
+            self._recent.popitem(last=False)
+
+    def clear(self):
+        self._recent.clear()
+
+
+class CountingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return self.connection.run_statement(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.connection.run_statement(super().executemany, sql, seq_of_parameters)
+
+
+class StatementCachingConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that counts statement cache hits and misses and
+    can reuse one cursor per SQL string through execute_cached().
+
+    Its authorizer is installed once, when it opens: changing it would
+    expire every prepared statement. Instead, the tables a statement
+    touches are captured while it is prepared and replayed to each
+    object in `table_listeners` (see cache.TableRecorder) on every run,
+    whether or not SQLite had to prepare it again.
+    """
+
+    def __init__(self, *args, cached_statements=STATEMENT_CACHE_SIZE, **kwargs):
+        super().__init__(*args, cached_statements=cached_statements, **kwargs)
+        self.statements = StatementStats(cached_statements)
+        self.table_listeners = []
+        self.cursors_reused = 0
+        self._cursors = OrderedDict()
+        self._preparing = None
+        self.set_authorizer(self._authorize)
+
+    def set_authorizer(self, authorizer):
+        # Replacing the authorizer expires SQLite's statements; drop the mirror too
+        self.statements.clear()
+        super().set_authorizer(authorizer)
+
+    def _authorize(self, action, arg1, arg2, dbname, trigger):
+        if self._preparing is not None:
+            self._preparing.append((action, arg1, arg2, dbname))
+        return sqlite3.SQLITE_OK
+
+    def run_statement(self, execute, sql, parameters):
+        """Run `execute(sql, parameters)`, counting the statement and reporting its tables"""
+        actions = self.statements.record(sql)
+        if actions is None:
+            self._preparing = []
+            try:
+                result = execute(sql, parameters)
+            finally:
+                actions, self._preparing = self._preparing, None
+            self.statements.prepared(sql, actions)
+        else:
+            result = execute(sql, parameters)
+        for listener in self.table_listeners:
+            for action in actions:
+                listener.record(*action)
+        return result
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def execute_cached(self, sql, parameters=(), one=False):
+        """
+        Run `sql` on a cursor kept for it and return every row, or with
+        one=True the first row (None when there is none).
+
+        The rows are fetched here because a cursor left mid-result keeps
+        its statement running, which pins the connection's read snapshot.
+        """
+        cursor = self._cursors.pop(sql, None)
+        if cursor is None:
+            cursor = self.cursor()
+        else:
+            self.cursors_reused += 1
+        cursor.row_factory = self.row_factory
+        cursor.execute(sql, parameters)
+        if not one:
+            result = cursor.fetchall()
+        else:
+            result = cursor.fetchone()
+            if result is not None and cursor.fetchone() is not None:
+                cursor.close()  # More rows left; closing resets the statement
+                return result
+        self._cursors[sql] = cursor
+        if len(self._cursors) > self.statements.size:
+            self._cursors.popitem(last=False)[1].close()
+        return result
+
+
+class PoolExhausted(Exception):
+    """Raised when no pooled connection frees up within the timeout"""
+
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections to one database file.
+
+    A connection is checked out by one thread at a time, so they are
+    opened with check_same_thread=False and handed between threads. Up
+    to `size` connections are opened on demand; further callers wait
+    up to `timeout` seconds for one to be released. Released connections
+    have any open transaction rolled back, so a caller that forgot to
+    commit never leaks writes to the next one, and the cache invalidations
+    @invalidates_cache left pending for them are settled.
+
+    Connections are StatementCachingConnections keeping up to
+    `cached_statements` prepared statements, so hot queries skip parsing
+    and planning; metrics() sums their hit/miss counters.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, pragmas=None, timeout=POOL_TIMEOUT,
+                 cached_statements=STATEMENT_CACHE_SIZE, **connect_args):
+        self.path = path
+        self.size = size
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self.timeout = timeout
+        self.connect_args = dict(
+            connect_args, cached_statements=cached_statements,
+            factory=connect_args.get('factory', StatementCachingConnection))
+        self.created = self.borrowed = self.discarded = 0
+        self._connections = set()
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._available = threading.Condition()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, **self.connect_args)
+        try:
+            for name, value in self.pragmas.items():
+                if not name.isidentifier():
+                    raise ValueError(f"invalid PRAGMA name {name!r}")
+                conn.execute(f"PRAGMA {name} = {value}")
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"pool for {self.path} is closed")
+                if self._idle:
+                    self.borrowed += 1
+                    return self._idle.pop()
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhausted(f"no connection to {self.path} within {self.timeout}s")
+                self._available.wait(remaining)
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._available:
+                self._open -= 1
+                self._available.notify()
+            raise
+        with self._available:
+            self.created += 1
+            self.borrowed += 1
+            self._connections.add(conn)
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+                discard_uncommitted(conn)
+            else:
+                invalidate_committed(conn)  # Its caller committed without saying so
+            conn.row_factory = None
+        except sqlite3.Error:
+            discard_uncommitted(conn)
+            conn.close()
+            with self._available:
+                self._connections.discard(conn)
+                self._open -= 1
+                self.discarded += 1
+                self._available.notify()
+            return
+        with self._available:
+            if self._closed:
+                conn.close()
+                self._connections.discard(conn)
+                self._open -= 1
+            else:
+                self._idle.append(conn)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def metrics(self):
+        with self._available:
+            stats = [getattr(c, 'statements', None) for c in self._connections]
+            stats = [s for s in stats if s is not None]
+            return {
+                'open': self._open, 'idle': len(self._idle), 'size': self.size,
+                'created': self.created, 'borrowed': self.borrowed,
+                'discarded': self.discarded,
+                'statement_hits': sum(s.hits for s in stats),
+                'statement_misses': sum(s.misses for s in stats),
+                'cursors_reused': sum(getattr(c, 'cursors_reused', 0) for c in self._connections),
+            }
+
+    def close(self):
+        """Close idle connections now and the rest as they are released"""
+        with self._available:
+            self._closed = True
+            while self._idle:
+                conn = self._idle.pop()
+                conn.close()
+                self._connections.discard(conn)
+                self._open -= 1
+            self._available.notify_all()
+
+
+_pools = {}  # absolute path -> (pool, options it was created with)
+_pools_lock = threading.Lock()
+
+
+def pool_key(path):
+    """Absolute form of a database path, so a later chdir reaches the same file"""
+    if path == ':memory:' or path.startswith('file:'):
+        return path
+    return os.path.abspath(path)
+
+
+def get_pool(path, **options):
+    """
+    The process-wide pool for `path`, created with `options` on first use.
+
+    Later calls may omit the options; passing different ones raises
+    ValueError rather than silently returning a pool that ignores them.
+    """
+    path = pool_key(path)
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = (ConnectionPool(path, **options), options)
+        pool, created_with = _pools[path]
+        if options and options != created_with:
+            raise ValueError(
+                f"pool for {path} already exists with options {created_with!r}, not {options!r}")
+        return pool
+
+
+@atexit.register
+def close_pools():
+    with _pools_lock:
+        for pool, _ in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def with_pooled_connection(path, **options):
+    """
+    Decorator factory: like with_db_connection, but the connection passed
+    as the first argument is borrowed from get_pool(path, **options) and
+    returned afterwards instead of being opened and closed every call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_pool(path, **options).connection() as conn:
+                return func(conn, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""Behavioural tests for cache.py, db_pool.py and the cache_query decorator"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import unittest
+import importlib
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import cache  # noqa: E402
+import db_pool  # noqa: E402
+
+cache_query = None
+_cwd = None
+_tmp = None
+
+
+def setUpModule():
+    """4-cache_query.py runs its example on import, against ./example.db"""
+    global cache_query, _cwd, _tmp
+    _tmp = tempfile.TemporaryDirectory()
+    _cwd = os.getcwd()
+    os.chdir(_tmp.name)
+    make_users(os.path.join(_tmp.name, 'example.db'))
+    cache_query = importlib.import_module('4-cache_query').cache_query
+
+
+def tearDownModule():
+    db_pool.close_pools()
+    os.chdir(_cwd)
+    _tmp.cleanup()
+
+
+def make_users(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+    conn.execute("DELETE FROM users")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     [(i, f"user{i}", f"user{i}@example.com") for i in range(1, 4)])
+    conn.commit()
+    conn.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheQueryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        make_users(self.path)
+        self.clock = FakeClock()
+        self.cache = cache.QueryCache(ttl=10, clock=self.clock)
+        self.runs = 0
+
+    def tearDown(self):
+        db_pool.close_pools()
+        self.tmp.cleanup()
+
+    def call(self, func, **kwargs):
+        """Call `func` on a fresh connection, as with_db_connection would"""
+        conn = sqlite3.connect(self.path)
+        try:
+            return func(conn, **kwargs)
+        finally:
+            conn.close()
+
+    def in_threads(self, count, target):
+        results, errors = [], []
+
+        def run():
+            try:
+                results.append(target())
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return results, errors
+
+
+class TestSingleFlight(CacheQueryTestCase):
+
+    def test_concurrent_misses_run_the_query_once(self):
+        callers = 20
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            self.runs += 1
+            wait_for(lambda: self.cache.coalesced == callers - 1)
+            return conn.execute(query).fetchall()
+
+        results, errors = self.in_threads(
+            callers, lambda: self.call(fetch, query="SELECT name FROM users"))
+        self.assertEqual(errors, [])
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(len(results), callers)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(self.cache.stats()['coalesced'], callers - 1)
+
+    def test_error_reaches_every_waiter(self):
+        callers = 5
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            self.runs += 1
+            wait_for(lambda: self.cache.coalesced == callers - 1)
+            raise RuntimeError("boom")
+
+        results, errors = self.in_threads(
+            callers, lambda: self.call(fetch, query="SELECT name FROM users"))
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), callers)
+        self.assertTrue(all(isinstance(e, RuntimeError) for e in errors))
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(len(self.cache), 0)
+        # The failed flight is retired, so the next caller runs the query again
+        self.assertRaises(RuntimeError, self.call, fetch, query="SELECT name FROM users")
+        self.assertEqual(self.runs, 2)
+
+
+class TestStaleWhileRevalidate(CacheQueryTestCase):
+
+    def test_stale_value_served_while_one_refresh_runs(self):
+        release = threading.Event()
+        values = iter(['old', 'new'])
+
+        @cache_query(cache=self.cache, stale=100)
+        def fetch(conn, query):
+            self.runs += 1
+            if self.runs > 1:
+                release.wait(5)
+            conn.execute(query).fetchall()
+            return next(values)
+
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users"), 'old')
+        self.clock.now += 20  # Past the TTL, inside the stale window
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users"), 'old')
+        wait_for(lambda: self.runs == 2)
+        # The refresh is still blocked: callers keep getting the old value
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users"), 'old')
+        self.assertEqual(self.runs, 2)
+        release.set()
+        wait_for(lambda: not self.cache._flights)
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users"), 'new')
+        self.assertEqual(self.runs, 2)
+        self.assertEqual(self.cache.stats()['stale_hits'], 2)
+
+    def test_failed_refresh_keeps_serving_the_stale_value(self):
+        @cache_query(cache=self.cache, stale=100)
+        def fetch(conn, query):
+            self.runs += 1
+            if self.runs > 1:
+                raise RuntimeError("refresh failed")
+            return conn.execute(query).fetchall()
+
+        first = self.call(fetch, query="SELECT name FROM users")
+        self.clock.now += 20
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users"), first)
+        wait_for(lambda: self.cache.refresh_errors == 1)
+        wait_for(lambda: not self.cache._flights)
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users"), first)
+        self.clock.now += 200  # Past the stale window: the caller runs it and sees the error
+        wait_for(lambda: not self.cache._flights)
+        self.assertRaises(RuntimeError, self.call, fetch, query="SELECT name FROM users")
+
+    def test_refresh_borrows_a_pooled_connection(self):
+        @db_pool.with_pooled_connection(self.path)
+        @cache_query(cache=self.cache, stale=60)
+        def fetch(conn, query):
+            self.runs += 1
+            return conn.execute_cached(query)  # Only pooled connections have it
+
+        query = "SELECT name FROM users WHERE id = 1"
+        self.assertEqual(fetch(query=query), [('user1',)])
+        conn = sqlite3.connect(self.path)
+        conn.execute("UPDATE users SET name = 'renamed' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        self.clock.now += 20
+        self.assertEqual(fetch(query=query), [('user1',)])
+        wait_for(lambda: not self.cache._flights)
+        self.assertEqual(self.cache.refresh_errors, 0)
+        self.assertEqual(fetch(query=query), [('renamed',)])
+        self.assertEqual(self.runs, 2)
+
+
+class TestInvalidation(CacheQueryTestCase):
+
+    def test_write_during_query_is_not_cached(self):
+        @cache.invalidates_cache(cache=self.cache)
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ? WHERE id = 1", (name,))
+            conn.commit()
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            self.runs += 1
+            rows = conn.execute(query).fetchall()
+            if self.runs == 1:
+                self.call(rename, name='renamed')  # Lands after this query read
+            return rows
+
+        query = "SELECT name FROM users WHERE id = 1"
+        self.assertEqual(self.call(fetch, query=query), [('user1',)])
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.call(fetch, query=query), [('renamed',)])
+        self.assertEqual(self.call(fetch, query=query), [('renamed',)])
+        self.assertEqual(self.runs, 2)
+
+    def test_uncommitted_write_is_invalidated_again_on_commit(self):
+        @cache.invalidates_cache(cache=self.cache)
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ? WHERE id = 1", (name,))
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            return conn.execute(query).fetchall()
+
+        query = "SELECT name FROM users WHERE id = 1"
+        writer = sqlite3.connect(self.path)
+        try:
+            rename(writer, 'renamed')
+            # A reader between the write and the commit caches the old row
+            self.assertEqual(self.call(fetch, query=query), [('user1',)])
+            writer.commit()
+            cache.invalidate_committed(writer)
+        finally:
+            writer.close()
+        self.assertEqual(self.call(fetch, query=query), [('renamed',)])
+
+    def test_pending_invalidations_stay_bounded(self):
+        @cache.invalidates_cache(cache=self.cache)
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ? WHERE id = 1", (name,))
+
+        writer = sqlite3.connect(self.path)
+        try:
+            for i in range(100):
+                rename(writer, f"name{i}")
+            pending = cache._uncommitted[id(writer)]
+            self.assertEqual([tables for _, tables in pending.values()],
+                             [{(self.path, 'users')}])
+            writer.rollback()
+            cache.discard_uncommitted(writer)
+            self.assertNotIn(id(writer), cache._uncommitted)
+        finally:
+            writer.close()
+
+    def test_pool_release_settles_pending_invalidations(self):
+        pool = db_pool.ConnectionPool(self.path, size=1)
+        self.addCleanup(pool.close)
+
+        @cache.invalidates_cache(cache=self.cache)
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ? WHERE id = 1", (name,))
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            self.runs += 1
+            return conn.execute(query).fetchall()
+
+        query = "SELECT name FROM users WHERE id = 1"
+        for i in range(100):
+            with pool.connection() as conn:
+                rename(conn, f"name{i}")  # Never committed: release rolls it back
+                key = id(conn)
+        self.assertNotIn(key, cache._uncommitted)
+        self.assertEqual(self.call(fetch, query=query), [('user1',)])
+
+        # A commit the caller does not report is settled on release instead
+        with pool.connection() as conn:
+            rename(conn, 'renamed')
+            self.assertEqual(self.call(fetch, query=query), [('user1',)])
+            conn.commit()
+        self.assertNotIn(key, cache._uncommitted)
+        self.assertEqual(self.call(fetch, query=query), [('renamed',)])
+        self.assertEqual(self.runs, 3)
+
+
+class TestDiskTier(CacheQueryTestCase):
+
+    def test_restart_loads_from_disk_until_the_database_changes(self):
+        disk_path = os.path.join(self.tmp.name, 'query_cache.sqlite3')
+
+        def fetch_with(query_cache):
+            @cache_query(cache=query_cache)
+            def fetch(conn, query):
+                self.runs += 1
+                return conn.execute(query).fetchall()
+            return fetch
+
+        query = "SELECT name FROM users ORDER BY id"
+        first = cache.QueryCache(disk=cache.DiskCache(disk_path))
+        expected = self.call(fetch_with(first), query=query)
+        first.disk.close()
+
+        restarted = cache.QueryCache(disk=cache.DiskCache(disk_path))
+        self.assertEqual(self.call(fetch_with(restarted), query=query), expected)
+        self.assertEqual(self.runs, 1)
+        self.assertEqual(restarted.disk_hits, 1)
+
+        conn = sqlite3.connect(self.path)
+        conn.execute("UPDATE users SET name = 'changed' WHERE id = 1")
+        conn.commit()
+        conn.close()
+        again = cache.QueryCache(disk=cache.DiskCache(disk_path))
+        self.assertEqual(self.call(fetch_with(again), query=query)[0], ('changed',))
+        self.assertEqual(self.runs, 2)
+        for tier in (restarted, again):
+            tier.disk.close()
+
+    def test_unpicklable_arguments_stay_in_memory(self):
+        tiered = cache.QueryCache(disk=cache.DiskCache(os.path.join(self.tmp.name, 'qc.sqlite3')))
+
+        @cache_query(cache=tiered)
+        def fetch(conn, query, tag):
+            return conn.execute(query).fetchall()
+
+        lock = threading.Lock()
+        rows = self.call(fetch, query="SELECT name FROM users", tag=lock)
+        self.assertEqual(self.call(fetch, query="SELECT name FROM users", tag=lock), rows)
+        self.assertEqual(tiered.hits, 1)
+        tiered.disk.close()
+
+    def test_write_during_disk_load_is_not_cached(self):
+        disk_path = os.path.join(self.tmp.name, 'query_cache.sqlite3')
+        query = "SELECT name FROM users ORDER BY id"
+
+        class WrittenDuringGet(cache.DiskCache):
+            def get(disk, key, stamp):
+                found = super().get(key, stamp)
+                tiered.invalidate({(self.path, 'users')})  # Lands after the lookup
+                return found
+
+        warm = cache.QueryCache(disk=cache.DiskCache(disk_path))
+        conn = sqlite3.connect(self.path)
+        try:
+            key = warm.key(conn, query)
+            warm.store(key, conn.execute(query).fetchall(),
+                       {(self.path, 'users')}, stamp=warm.stamp(key))
+        finally:
+            conn.close()
+        warm.disk.close()
+
+        tiered = cache.QueryCache(disk=WrittenDuringGet(disk_path))
+        self.assertIsNot(tiered.load(key), cache.MISSING)
+        self.assertEqual(len(tiered), 0)
+        tiered.disk.close()
+
+
+class TestConnectionPool(CacheQueryTestCase):
+
+    def test_pools_are_keyed_by_absolute_path(self):
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, _tmp.name)
+        pool = db_pool.get_pool('users.db')
+        self.assertEqual(pool.path, self.path)
+        os.chdir(_tmp.name)
+        self.assertIsNot(db_pool.get_pool('users.db'), pool)
+        self.assertIs(db_pool.get_pool(self.path), pool)
+
+    def test_conflicting_options_are_rejected(self):
+        pool = db_pool.get_pool(self.path, size=2)
+        self.assertIs(db_pool.get_pool(self.path), pool)
+        self.assertIs(db_pool.get_pool(self.path, size=2), pool)
+        self.assertRaises(ValueError, db_pool.get_pool, self.path, size=4)
+        self.assertEqual(pool.size, 2)
+
+
+class TestStatementCache(CacheQueryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = db_pool.ConnectionPool(self.path, size=1)
+        self.addCleanup(self.pool.close)
+
+    def test_misses_stay_flat_across_cached_reads_and_writes(self):
+        def cycle(conn, i):
+            conn.execute_cached("SELECT name FROM users WHERE id = ?", (1,), one=True)
+            conn.execute("UPDATE users SET email = ? WHERE id = 1", (f"u{i}@example.com",))
+            conn.commit()
+
+        with self.pool.connection() as conn:
+            with cache.TableRecorder(conn):
+                cycle(conn, 0)
+            misses, hits = conn.statements.misses, conn.statements.hits
+            for i in range(1, 50):
+                with cache.TableRecorder(conn):  # Runs PRAGMA database_list too
+                    cycle(conn, i)
+        metrics = self.pool.metrics()
+        self.assertEqual(metrics['statement_misses'], misses)
+        self.assertEqual(metrics['statement_hits'], hits + 49 * 3)
+        self.assertEqual(metrics['cursors_reused'], 49)
+
+    def test_statements_prepared_earlier_still_report_their_tables(self):
+        @cache.invalidates_cache(cache=self.cache)
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ? WHERE id = 1", (name,))
+            conn.commit()
+
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            self.runs += 1
+            return conn.execute_cached(query)
+
+        query = "SELECT name FROM users WHERE id = 1"
+        expected = 'user1'
+        for i in range(3):
+            with self.pool.connection() as conn:
+                self.assertEqual(fetch(conn, query=query), [(expected,)])
+                self.assertEqual(fetch(conn, query=query), [(expected,)])
+                # Prepared on an earlier pass, so only the replay reports users
+                expected = f"name{i}"
+                rename(conn, expected)
+        self.assertEqual(self.runs, 3)
+        self.assertEqual(self.cache.stats()['invalidations'], 3)
+        with self.pool.connection() as conn:
+            self.assertGreater(conn.statements.hits, 0)
+            with cache.TableRecorder(conn) as tables:
+                conn.execute_cached(query)
+        self.assertEqual(tables.read, {(self.path, 'users')})
+        self.assertEqual(tables.written, set())
+
+    def test_cursor_reuse_with_one(self):
+        with self.pool.connection() as conn:
+            one = "SELECT name FROM users WHERE id = ?"
+            self.assertEqual(conn.execute_cached(one, (1,), one=True), ('user1',))
+            self.assertIsNone(conn.execute_cached(one, (99,), one=True))
+            self.assertEqual(conn.execute_cached(one, (2,), one=True), ('user2',))
+            self.assertEqual(conn.cursors_reused, 2)
+            # Rows left over: the cursor is closed rather than kept mid-result
+            many = "SELECT name FROM users ORDER BY id"
+            self.assertEqual(conn.execute_cached(many, one=True), ('user1',))
+            self.assertEqual(conn.execute_cached(many, one=True), ('user1',))
+            self.assertEqual(conn.cursors_reused, 2)
+            self.assertFalse(conn.in_transaction)
+
+    def test_replacing_the_authorizer_resets_the_mirror(self):
+        with self.pool.connection() as conn:
+            misses = conn.statements.misses  # The pool's PRAGMAs
+            conn.execute_cached("SELECT name FROM users")
+            conn.execute_cached("SELECT name FROM users")
+            self.assertEqual(conn.statements.misses, misses + 1)
+            conn.set_authorizer(conn._authorize)
+            conn.execute_cached("SELECT name FROM users")
+            self.assertEqual(conn.statements.misses, misses + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,82 @@
-from seed import connect_to_prodev
+from seed import connect_to_prodev, TABLE_NAME, USER_COLUMNS, WATERMARK_COLUMN
+rows = __import__('rows')
+checkpoints = __import__('checkpoint')
 
-def stream_users():
-  
+# Rows pulled from the server per round trip; bounds the memory held at once.
+DEFAULT_CHUNK_SIZE = 1000
+# Rows changed in the last WATERMARK_LAG seconds wait for the next run, so
+# transactions still committing with older timestamps are not skipped.
+WATERMARK_LAG = 5
+
+
+def changed_users_query(watermark_state, lag=WATERMARK_LAG):
+    """
+    Return (sql, params) selecting rows changed after the saved watermark,
+    in (updated_at, user_id) order, with updated_at as the last column.
+    """
+    sql = (f"SELECT {', '.join(USER_COLUMNS)}, {WATERMARK_COLUMN} FROM {TABLE_NAME} "
+           f"WHERE {WATERMARK_COLUMN} < NOW(6) - INTERVAL %s SECOND")
+    params = [lag]
+    if watermark_state:
+        sql += (f" AND ({WATERMARK_COLUMN} > %s"
+                f" OR ({WATERMARK_COLUMN} = %s AND user_id > %s))")
+        mark = watermark_state[WATERMARK_COLUMN]
+        params += [mark, mark, watermark_state['user_id']]
+    sql += f" ORDER BY {WATERMARK_COLUMN}, user_id"
+    return sql, tuple(params)
+
+
+def stream_user_chunks(chunk_size=DEFAULT_CHUNK_SIZE, row_format=rows.DICT,
+                       watermark=None, lag=WATERMARK_LAG):
+    """
+    Generator that yields lists of up to `chunk_size` user_data rows.
+
+    Uses an unbuffered cursor so MySQL streams the result set over the
+    socket and only one chunk lives in Python at any time. row_format
+    picks the chunk shape: 'dict', 'tuple', 'slots' or 'columnar'.
+
+    With a `watermark` file, only rows inserted or updated since the
+    watermark saved there are streamed, and the watermark advances as
+    each chunk is consumed.
+    """
+    rows.check_format(row_format, batch=True)
     connection = connect_to_prodev()
     if not connection:
         return  # Graceful fail if connection failed
 
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data")
-    rows = cursor.fetchall()
+    if watermark is None:
+        sql, params = f"SELECT {', '.join(USER_COLUMNS)} FROM {TABLE_NAME}", ()
+    else:
+        sql, params = changed_users_query(checkpoints.load_checkpoint(watermark), lag)
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(sql, params)
+        while chunk := cursor.fetchmany(chunk_size):
+            if watermark is None:
+                yield rows.shape_rows(chunk, USER_COLUMNS, row_format)
+                continue
+            yield rows.shape_rows([row[:-1] for row in chunk], USER_COLUMNS, row_format)
+            last = chunk[-1]
+            checkpoints.save_checkpoint(
+                watermark, {WATERMARK_COLUMN: str(last[-1]), 'user_id': last[0]})
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass  # Unread rows are left behind when the consumer stops early
+        connection.close()
+
 
-    for row in rows:
-        yield row
+def stream_users(chunk_size=DEFAULT_CHUNK_SIZE, row_format=rows.DICT,
+                 watermark=None, lag=WATERMARK_LAG):
+    """
+    Generator that yields rows from user_data one by one
 
-    cursor.close()
-    connection.close()
+    Rows are dictionaries by default; row_format='tuple' or 'slots'
+    yields tuples (see rows.column_index) or UserRow objects instead.
+    With a `watermark` file, only rows changed since the previous run
+    with that file are yielded.
+    """
+    rows.check_format(row_format)
+    for chunk in stream_user_chunks(chunk_size, row_format, watermark, lag):
+        yield from chunk
@@ -1,31 +1,104 @@
 
+import sys
+from decimal import Decimal
+
 seed = __import__('seed')
+pagination = __import__('pagination')
+checkpoints = __import__('checkpoint')
+
+
+def paginate_users(batch_size, offset, connection=None, columns=None, filters=()):
+    """
+    Fetch a batch of users from the database.
+
+    Only `columns` (default: all) of rows matching every
+    (column, operator, value) filter are fetched. Uses `connection` when
+    given, otherwise opens and closes its own.
+    """
+    sql, params = pagination.build_query(
+        batch_size, pagination.OFFSET, offset, columns, filters)
+    return pagination.fetch_page(sql, params, connection)
+
 
+def checkpoint_value(value):
+    """A filter value as saved in a checkpoint; raises TypeError if JSON cannot hold it"""
+    if isinstance(value, Decimal):
+        return {'decimal': str(value)}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"filter value {value!r} cannot be saved in a checkpoint")
 
-def paginate_users(batch_size, offset):
-    """Fetch a batch of users from the database"""
+
+def stream_users_in_batches(batch_size, mode=pagination.OFFSET,
+                            columns=None, filters=(), row_format='dict',
+                            checkpoint=None, checkpoint_every=10):
+    """
+    Generator that yields batches of users from the database.
+
+    mode="keyset" seeks on user_id instead of using LIMIT/OFFSET.
+    `columns` and `filters` are pushed down into the SELECT list and
+    WHERE clause, e.g. filters=[('age', '>', 25)].
+    row_format picks the batch shape: 'dict', 'tuple', 'slots' or
+    'columnar' (see rows.py).
+    With a `checkpoint` path (keyset mode only: an OFFSET goes stale as
+    soon as rows are inserted or deleted), the position after every
+    `checkpoint_every` consumed batches is saved there atomically, and a
+    later run with the same path and query resumes from it. A batch
+    counts as consumed once the consumer asks for the next one, so a
+    crash replays at most `checkpoint_every` batches and never skips one.
+    One connection serves every batch and is closed when the generator
+    is exhausted, closed or garbage collected.
+    """
+    pagination.check_mode(mode)
+    state = {'query': None, 'position': None, 'batches': 0, 'done': False}
+    if checkpoint:
+        if mode != pagination.KEYSET:
+            raise ValueError("checkpoints need mode='keyset'")
+        query = {'mode': mode, 'columns': list(columns or []),
+                 'filters': [[c, op, checkpoint_value(v)] for c, op, v in filters]}
+        state['query'] = query
+        saved = checkpoints.load_checkpoint(checkpoint)
+        if saved is not None:
+            if saved['query'] != query:
+                raise ValueError(f"checkpoint {checkpoint} belongs to a different query")
+            state = saved
+            if state['done']:
+                return
     connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {batch_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
-
-
-def stream_users_in_batches(batch_size):
-    """Generator that yields batches of users from the database"""
-    offset = 0
-    while True:
-        batch = paginate_users(batch_size, offset)
-        if not batch:
-            break
-        yield batch
-        offset += batch_size
-
-
-def batch_processing(batch_size):
-    """Processes and prints users over the age of 25"""
-    for batch in stream_users_in_batches(batch_size):
-        for user in batch:
-            if user['age'] > 25:
-                print(user)
+    if not connection:
+        return  # Graceful fail if connection failed
+    try:
+        for batch, position in pagination.positioned_pages(
+                batch_size, mode, connection, columns, filters, row_format,
+                state['position']):
+            yield batch
+            state['position'] = position
+            state['batches'] += 1
+            if checkpoint and state['batches'] % checkpoint_every == 0:
+                checkpoints.save_checkpoint(checkpoint, state)
+        state['done'] = True
+        if checkpoint:
+            checkpoints.save_checkpoint(checkpoint, state)
+    finally:
+        connection.close()
+
+
+def batch_processing(batch_size, mode=None, out=None, checkpoint=None):
+    """
+    Processes and prints users over the age of 25
+
+    The age filter runs in SQL, and each batch is written to `out`
+    (default: stdout) in a single call. With a `checkpoint` path, output
+    is flushed per batch and a rerun resumes where the last one stopped.
+    `mode` defaults to keyset when checkpointing and offset otherwise;
+    an explicit mode='offset' with a checkpoint raises ValueError.
+    """
+    out = out or sys.stdout
+    if mode is None:
+        mode = pagination.KEYSET if checkpoint else pagination.OFFSET
+    batches = stream_users_in_batches(
+        batch_size, mode, filters=[('age', '>', 25)], checkpoint=checkpoint)
+    for batch in batches:
+        out.write(''.join(f"{user}\n" for user in batch))
+        if checkpoint:
+            out.flush()
@@ -1,24 +1,40 @@
 #!/usr/bin/python3
 seed = __import__('seed')
+pagination = __import__('pagination')
 
 
-def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
-    rows = cursor.fetchall()
-    connection.close()
-    return rows
+def paginate_users(page_size, offset, connection=None):
+    """
+    Fetch one page of users.
+
+    Uses `connection` when given, otherwise opens and closes its own.
+    """
+    sql, params = pagination.build_query(page_size, pagination.OFFSET, offset)
+    return pagination.fetch_page(sql, params, connection)
 
 
-def lazy_pagination(page_size):
+def lazy_pagination(page_size, mode=pagination.OFFSET, prefetch=0, row_format='dict'):
     """
     Generator that yields users in pages using lazy loading
+
+    mode="keyset" seeks on user_id instead of using LIMIT/OFFSET.
+    prefetch=K fetches pages on a background thread, keeping up to K
+    ready ahead of the consumer; the thread blocks when K are queued and
+    stops when the generator is closed.
+    row_format picks the page shape: 'dict', 'tuple', 'slots' or
+    'columnar' (see rows.py).
+    One connection serves every page and is closed when the generator
+    is exhausted, closed or garbage collected.
     """
-    offset = 0
-    while True:  # ✅ only one loop
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+    pagination.check_mode(mode)
+    if prefetch:
+        yield from seed.read_ahead(
+            lazy_pagination(page_size, mode, row_format=row_format), prefetch)
+        return
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return  # Graceful fail if connection failed
+    try:
+        yield from pagination.pages(page_size, mode, connection, row_format=row_format)
+    finally:
+        connection.close()
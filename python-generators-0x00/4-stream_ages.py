@@ -5,21 +5,47 @@ Compute average age using generator for memory efficiency
 """
 
 import random
+from concurrent.futures import ProcessPoolExecutor
 
-def stream_user_ages():
+stats = __import__('stats')
+synthetic = __import__('synthetic')
+
+def stream_user_ages(count=1000000, seed=None):
     """
     Generator that yields user ages one by one.
     In real-world use, this could stream from a file, database, or API.
+
+    Ages are drawn in NumPy chunks when numpy is installed; `seed` makes
+    the stream reproducible.
     """
     # Simulating large data stream with random ages
-    for _ in range(1000000):  # Simulate 1 million users
-        yield random.randint(18, 90)  # Age between 18 and 90
+    if synthetic.HAVE_NUMPY:
+        for chunk in synthetic.age_chunks(count, seed=seed):
+            yield from chunk.tolist()
+        return
+    rng = random.Random(seed)
+    for _ in range(count):  # Simulate 1 million users by default
+        yield rng.randint(18, 90)  # Age between 18 and 90
 
 
-def calculate_average_age():
+def calculate_average_age(backend='python'):
     """
     Consumes the generator to compute average age without loading entire data into memory.
+
+    backend="sql" or "numpy" aggregates user_data through aggregate.py
+    instead of looping over Python ints.
     """
+    if backend != 'python':
+        # aggregate pulls in seed and mysql.connector; importing it only for
+        # these backends keeps the simulated stream free of a MySQL driver
+        aggregate = __import__('aggregate')
+        result = aggregate.aggregate_ages(backend)
+        if not result or not result['count']:
+            print("No users found.")
+        else:
+            print(f"Average age of users: {result['mean']:.2f}")
+        return
+
     total = 0
     count = 0
 
@@ -34,5 +60,23 @@ def calculate_average_age():
         print(f"Average age of users: {average:.2f}")
 
 
+def summarize_ages(count):
+    """Process-pool worker: statistics over one shard of the age stream"""
+    return stats.summarize(stream_user_ages(count))
+
+
+def calculate_age_statistics(shards=1, count=1000000):
+    """
+    Computes mean, variance, min/max, histogram and quantiles of the ages
+    in one pass, splitting the stream across `shards` processes and
+    merging their partial results.
+    """
+    if shards == 1:
+        return summarize_ages(count).summary()
+    sizes = [count // shards + (i < count % shards) for i in range(shards)]
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        return stats.merge_all(pool.map(summarize_ages, sizes)).summary()
+
+
 if __name__ == "__main__":
     calculate_average_age()
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+"""
+aggregate.py
+Age aggregates over user_data without a Python loop per row.
+
+Two backends return the same result dict:
+- sql: MySQL returns a per-age histogram in one GROUP BY scan; count,
+  sum, mean, min, max and percentiles are read off it.
+- numpy: ages stream from an unbuffered cursor in array chunks and are
+  reduced with NumPy, keeping memory bounded by the chunk size.
+
+Percentiles use the nearest-rank definition in both backends.
+"""
+import math
+
+seed = __import__('seed')
+
+try:
+    import numpy as np
+except ImportError:  # The numpy backend is optional
+    np = None
+
+BACKENDS = ('sql', 'numpy')
+PERCENTILES = (0.5, 0.9, 0.99)
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def nearest_rank(p, count):
+    """Zero-based index of the p-th percentile among `count` sorted values"""
+    return min(max(math.ceil(p * count) - 1, 0), count - 1)
+
+
+def histogram_percentiles(histogram, count, percentiles=PERCENTILES):
+    """Nearest-rank percentiles from (age, count) pairs sorted by age"""
+    result = {}
+    targets = sorted((nearest_rank(p, count), p) for p in percentiles)
+    seen = 0
+    for age, n in histogram:
+        seen += n
+        while targets and targets[0][0] < seen:
+            result[targets.pop(0)[1]] = age
+        if not targets:
+            break
+    return result
+
+
+def sql_aggregate(percentiles=PERCENTILES):
+    """
+    Compute age aggregates inside MySQL.
+
+    Ages are whole years, so one GROUP BY age returns a histogram of at
+    most a few hundred rows; the percentiles are read off it here instead
+    of sorting the table once per percentile.
+    """
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return None
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"SELECT CAST(age AS SIGNED), COUNT(*) FROM {seed.TABLE_NAME} "
+            f"GROUP BY age ORDER BY age")
+        histogram = [(int(age), int(n)) for age, n in cursor.fetchall()]
+    finally:
+        cursor.close()
+        connection.close()
+    count = sum(n for _, n in histogram)
+    total = sum(age * n for age, n in histogram)
+    return {'count': count, 'sum': total, 'mean': total / count if count else None,
+            'min': histogram[0][0] if count else None,
+            'max': histogram[-1][0] if count else None,
+            'percentiles': histogram_percentiles(histogram, count, percentiles) if count else {}}
+
+
+def stream_age_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Generator that yields ages as int64 NumPy arrays of up to `chunk_size`"""
+    if np is None:
+        raise ImportError("the numpy backend needs numpy installed")
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(f"SELECT CAST(age AS SIGNED) FROM {seed.TABLE_NAME}")
+        while rows := cursor.fetchmany(chunk_size):
+            yield np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass  # Unread rows are left behind when the consumer stops early
+        connection.close()
+
+
+def numpy_aggregate(chunks, percentiles=PERCENTILES):
+    """
+    Reduce an iterable of integer age arrays with NumPy.
+
+    Ages are whole years, so a running bincount gives exact percentiles
+    in memory bounded by the largest age.
+    """
+    count, total = 0, 0
+    low, high = None, None
+    histogram = np.zeros(0, dtype=np.int64)
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        count += len(chunk)
+        total += int(chunk.sum())
+        low = int(chunk.min()) if low is None else min(low, int(chunk.min()))
+        high = int(chunk.max()) if high is None else max(high, int(chunk.max()))
+        counts = np.bincount(chunk)
+        if len(counts) > len(histogram):
+            histogram = np.pad(histogram, (0, len(counts) - len(histogram)))
+        histogram[:len(counts)] += counts
+    result = {'count': count, 'sum': total, 'mean': total / count if count else None,
+              'min': low, 'max': high, 'percentiles': {}}
+    if count:
+        cumulative = np.cumsum(histogram)
+        for p in percentiles:
+            result['percentiles'][p] = int(
+                np.searchsorted(cumulative, nearest_rank(p, count) + 1))
+    return result
+
+
+def aggregate_ages(backend='sql', percentiles=PERCENTILES, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Compute age aggregates over user_data with the chosen backend"""
+    if backend == 'sql':
+        return sql_aggregate(percentiles)
+    if backend == 'numpy':
+        return numpy_aggregate(stream_age_chunks(chunk_size), percentiles)
+    raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""
+async_streams.py
+`async for` versions of stream_users, stream_users_in_batches and
+lazy_pagination.
+
+The synchronous generators run on a worker thread via asyncio.to_thread,
+standing in for an async MySQL driver. With prefetch on, the round trip
+for the next page starts before the current one is handed to the
+consumer, so database latency overlaps with the consumer's own work.
+Arguments, page contents and connection handling match the sync
+versions.
+"""
+import asyncio
+from contextlib import aclosing
+
+pagination = __import__('pagination')
+stream = __import__('0-stream_users')
+batch_processing = __import__('1-batch_processing')
+lazy_paginate = __import__('2-lazy_paginate')
+
+_END = object()
+
+
+async def iterate_in_thread(iterator, prefetch=True):
+    """
+    Async generator over a blocking iterator.
+
+    Every next() call runs on a worker thread; with `prefetch` the call
+    for item N+1 is already running while item N is being consumed.
+    The iterator is closed on its worker thread when this generator is.
+    """
+    def fetch():
+        return asyncio.ensure_future(asyncio.to_thread(next, iterator, _END))
+
+    pending = fetch()
+    try:
+        while True:
+            item = await pending
+            pending = None
+            if item is _END:
+                return
+            if prefetch:
+                pending = fetch()
+                yield item
+            else:
+                yield item
+                pending = fetch()
+    finally:
+        if pending is not None:
+            await asyncio.wait([pending])  # A blocking next() cannot be cancelled
+        close = getattr(iterator, 'close', None)
+        if close:
+            await asyncio.to_thread(close)
+
+
+async def stream_users(chunk_size=stream.DEFAULT_CHUNK_SIZE, prefetch=True,
+                       row_format='dict'):
+    """Async generator that yields rows from user_data one by one"""
+    stream.rows.check_format(row_format)
+    chunks = iterate_in_thread(stream.stream_user_chunks(chunk_size, row_format), prefetch)
+    async with aclosing(chunks):
+        async for rows in chunks:
+            for row in rows:
+                yield row
+
+
+async def stream_users_in_batches(batch_size, mode=pagination.OFFSET,
+                                  columns=None, filters=(), prefetch=True,
+                                  row_format='dict'):
+    """Async generator that yields batches of users from the database"""
+    batches = iterate_in_thread(
+        batch_processing.stream_users_in_batches(
+            batch_size, mode, columns, filters, row_format),
+        prefetch)
+    async with aclosing(batches):
+        async for batch in batches:
+            yield batch
+
+
+async def lazy_pagination(page_size, mode=pagination.OFFSET, prefetch=True,
+                          row_format='dict'):
+    """Async generator that yields users in pages using lazy loading"""
+    pages = iterate_in_thread(
+        lazy_paginate.lazy_pagination(page_size, mode, row_format=row_format), prefetch)
+    async with aclosing(pages):
+        async for page in pages:
+            yield page
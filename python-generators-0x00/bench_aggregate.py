@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""
+bench_aggregate.py
+Compare the pure-Python average loop with the sql and numpy backends.
+
+Usage: ./bench_aggregate.py
+The python row averages the simulated stream_user_ages() generator; the
+other backends aggregate the real user_data table.
+"""
+import time
+
+aggregate = __import__('aggregate')
+stream_ages = __import__('4-stream_ages')
+
+
+def python_loop():
+    """The original calculate_average_age loop"""
+    total = count = 0
+    for age in stream_ages.stream_user_ages():
+        total += age
+        count += 1
+    return {'count': count, 'mean': total / count if count else None}
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    count = result['count'] if result else 0
+    rate = count / elapsed if elapsed else 0
+    print(f"{label:>6}: {count} ages in {elapsed:.3f}s ({rate:,.0f} ages/s)")
+
+
+if __name__ == "__main__":
+    timed('python', python_loop)
+    timed('sql', lambda: aggregate.aggregate_ages('sql'))
+    if aggregate.np is not None:
+        timed('numpy', lambda: aggregate.aggregate_ages('numpy'))
+    else:
+        print(" numpy: skipped, numpy is not installed")
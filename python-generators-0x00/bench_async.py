@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""
+bench_async.py
+Show how much prefetching in async_streams.lazy_pagination overlaps
+database round trips with consumer work.
+
+Usage: ./bench_async.py [page_size] [pages] [work_ms]
+Each page is "processed" by sleeping work_ms milliseconds.
+"""
+import sys
+import time
+import asyncio
+
+async_streams = __import__('async_streams')
+
+
+async def consume(page_size, pages, work, prefetch):
+    """Return (rows, seconds) for reading `pages` pages with simulated work"""
+    start = time.perf_counter()
+    rows = 0
+    stream = async_streams.lazy_pagination(page_size, mode='keyset', prefetch=prefetch)
+    try:
+        async for page in stream:
+            rows += len(page)
+            await asyncio.sleep(work)
+            pages -= 1
+            if not pages:
+                break
+    finally:
+        await stream.aclose()
+    return rows, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    work = (float(sys.argv[3]) if len(sys.argv) > 3 else 5) / 1000
+    for prefetch in (False, True):
+        rows, elapsed = asyncio.run(consume(page_size, pages, work, prefetch))
+        label = "prefetch" if prefetch else "serial"
+        print(f"{label:>8}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
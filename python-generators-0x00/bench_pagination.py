@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""
+bench_pagination.py
+Compare LIMIT/OFFSET and keyset pagination over a full scan of user_data.
+
+Usage: ./bench_pagination.py [rows] [page_size]
+Tops user_data up with synthetic users until it holds `rows` rows.
+"""
+import sys
+import time
+import uuid
+import random
+
+seed = __import__('seed')
+lazy_paginate = __import__('2-lazy_paginate')
+
+
+def ensure_rows(rows, chunk_size=10000):
+    """Insert synthetic users until user_data holds at least `rows` rows"""
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {seed.TABLE_NAME}")
+    missing = rows - cursor.fetchone()[0]
+    while missing > 0:
+        chunk = [
+            (str(uuid.uuid4()), f"User {i}", f"user{i}@example.com",
+             random.randint(18, 90))
+            for i in range(min(chunk_size, missing))
+        ]
+        cursor.executemany(
+            f"INSERT INTO {seed.TABLE_NAME} (user_id, name, email, age) "
+            "VALUES (%s, %s, %s, %s)", chunk)
+        connection.commit()
+        missing -= len(chunk)
+    cursor.close()
+    connection.close()
+
+
+def time_scan(page_size, mode):
+    """Return (rows, seconds) for a full scan in the given mode"""
+    start = time.perf_counter()
+    rows = 0
+    for page in lazy_paginate.lazy_pagination(page_size, mode=mode):
+        rows += len(page)
+    return rows, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    ensure_rows(total)
+    for mode in ("offset", "keyset"):
+        rows, elapsed = time_scan(page_size, mode)
+        print(f"{mode:>6}: {rows} rows in {elapsed:.2f}s "
+              f"({rows / elapsed:,.0f} rows/s)")
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+"""
+benchmark.py
+Reproducible benchmarks for the python-generators-0x00 streams.
+
+Seeds a database with a fixed, seeded set of synthetic users, then
+measures rows/sec, time to first row and peak RSS for every stream and
+prints the results as JSON so runs can be compared for regressions.
+
+    ./benchmark.py --rows 100000 1000000 10000000 --output results.json
+    ./benchmark.py --backend mysql --rows 100000 --cases stream_users
+
+--backend sqlite (the default) keeps one SQLite file per size under
+--workdir and talks to it through sqlite_shim; --backend mysql uses the
+database configured in .env. Each case runs in a fresh subprocess so
+its peak RSS is its own. Peak RSS comes from the resource module, or
+from psutil on Windows; without either it is reported as null.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows; peak RSS comes from psutil there, if installed
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SEED = 20240614
+BATCH_SIZE = 1000
+
+
+def make_stream(case, batch_size, rows):
+    """Return (iterator, rows_per_item) for a benchmark case"""
+    if case == 'stream_users':
+        return __import__('0-stream_users').stream_users(batch_size), None
+    if case.startswith('stream_users_in_batches'):
+        mode = 'keyset' if case.endswith('keyset') else 'offset'
+        batches = __import__('1-batch_processing').stream_users_in_batches(batch_size, mode)
+        return batches, len
+    if case.startswith('lazy_pagination'):
+        mode = 'keyset' if case.endswith('keyset') else 'offset'
+        return __import__('2-lazy_paginate').lazy_pagination(batch_size, mode), len
+    if case == 'stream_user_ages':
+        # Simulated source: generates `rows` ages without touching the database
+        return __import__('4-stream_ages').stream_user_ages(rows), None
+    raise ValueError(f"unknown case {case!r}")
+
+
+CASES = (
+    'stream_users',
+    'stream_users_in_batches', 'stream_users_in_batches_keyset',
+    'lazy_pagination', 'lazy_pagination_keyset',
+    'stream_user_ages',
+)
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None if unmeasurable"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        # peak_wset is the Windows peak working set; elsewhere fall back to current RSS
+        return getattr(memory, 'peak_wset', memory.rss) // 1024
+    return None
+
+
+def format_kb(kb):
+    return 'n/a' if kb is None else f"{kb:,} KiB"
+
+
+def run_case(case, batch_size, rows):
+    """Consume one stream to the end and return its measurements"""
+    stream, size = make_stream(case, batch_size, rows)
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    first_row = None
+    count = 0
+    for item in stream:
+        if first_row is None:
+            first_row = time.perf_counter() - start
+        count += size(item) if size else 1
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb()
+    return {
+        'case': case, 'table_rows': rows, 'batch_size': batch_size,
+        'rows': count, 'seconds': elapsed,
+        'rows_per_sec': count / elapsed if elapsed else None,
+        'time_to_first_row': first_row,
+        'peak_rss_kb': peak,
+        'peak_rss_growth_kb': peak - baseline if peak is not None else None,
+    }
+
+
+def synthetic_users(count, rng):
+    """Deterministic user tuples for a given random.Random (no numpy)"""
+    for i in range(count):
+        user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        yield (user_id, f"User {i}", f"user{i}@example.com", rng.randint(18, 90))
+
+
+def seed_database(rows, batch_size=10000):
+    """Make user_data hold exactly `rows` synthetic users"""
+    seed = __import__('seed')
+    synthetic = __import__('synthetic')
+    connection = seed.get_connection(seed.DB_NAME)
+    if seed.DB_BACKEND != 'sqlite':
+        seed.create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {seed.TABLE_NAME}")
+    if cursor.fetchone()[0] != rows:
+        cursor.execute(f"DELETE FROM {seed.TABLE_NAME}")
+        connection.commit()
+        if synthetic.HAVE_NUMPY:
+            batches = (synthetic.batch_rows(b)
+                       for b in synthetic.user_batches(rows, batch_size, SEED))
+        else:
+            users = synthetic_users(rows, random.Random(SEED))
+            batches = iter(lambda: [u for _, u in zip(range(batch_size), users)], [])
+        seed.insert_batches(connection, batches)
+    cursor.close()
+    connection.close()
+
+
+def child_env(backend, workdir, rows):
+    env = dict(os.environ, SEED_BACKEND=backend)
+    if backend == 'sqlite':
+        env['SQLITE_PATH'] = os.path.abspath(os.path.join(workdir, f"bench_{rows}.sqlite3"))
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the user_data streams")
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workdir', default='.bench')
+    parser.add_argument('--output', help="also write the JSON report here")
+    parser.add_argument('--child', choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.batch_size, args.rows[0])))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {
+        'meta': {
+            'backend': args.backend, 'python': platform.python_version(),
+            'platform': platform.platform(), 'seed': SEED,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': [],
+    }
+    for rows in args.rows:
+        env = child_env(args.backend, args.workdir, rows)
+        subprocess.run([sys.executable, '-c', f"import benchmark; benchmark.seed_database({rows})"],
+                       env=env, check=True, stdout=subprocess.DEVNULL,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        for case in args.cases:
+            done = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', case,
+                 '--rows', str(rows), '--batch-size', str(args.batch_size)],
+                env=env, check=True, capture_output=True, text=True)
+            result = json.loads(done.stdout.strip().splitlines()[-1])
+            report['results'].append(result)
+            print(f"{case:>31} {rows:>9} rows: {result['rows_per_sec']:>12,.0f} rows/s, "
+                  f"first row {result['time_to_first_row'] or 0:.4f}s, "
+                  f"peak RSS {format_kb(result['peak_rss_kb'])}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+"""
+binary_export.py
+Compact columnar binary extracts of user_data.
+
+Layout (little-endian):
+    header  b'UDBX', version: u16, column count: u16,
+            then per column: type: u8, name length: u16, name (UTF-8)
+    batch   rows: u32, then per column
+              text:  byte length: u32, UTF-8 values joined by NUL
+              int64: rows * i64
+    end     rows = 0
+
+Reading a text column is one decode and one split per batch, and
+int64 columns are unpacked in a single struct call, which is far cheaper
+than parsing CSV. The reader memory-maps the file and yields batches in
+the same shapes as stream_users_in_batches.
+
+Usage: ./binary_export.py export path [batch_size]
+       ./binary_export.py count path
+"""
+import sys
+import mmap
+import struct
+
+rows = __import__('rows')
+batch_processing = __import__('1-batch_processing')
+
+MAGIC = b'UDBX'
+VERSION = 1
+TEXT, INT64 = 0, 1
+COLUMN_TYPES = {'user_id': TEXT, 'name': TEXT, 'email': TEXT, 'age': INT64}
+SEPARATOR = '\0'
+DEFAULT_BATCH_SIZE = 10000
+
+_U8, _U16, _U32 = struct.Struct('<B'), struct.Struct('<H'), struct.Struct('<I')
+
+
+def write_header(f, columns):
+    f.write(MAGIC + struct.pack('<HH', VERSION, len(columns)))
+    for column in columns:
+        name = column.encode('utf-8')
+        f.write(_U8.pack(COLUMN_TYPES[column]) + _U16.pack(len(name)) + name)
+
+
+def write_batch(f, batch, columns):
+    """Append one columnar batch ({column: values}) to the file"""
+    count = len(batch[columns[0]])
+    if not count:
+        return 0
+    f.write(_U32.pack(count))
+    for column in columns:
+        values = batch[column]
+        if COLUMN_TYPES[column] == INT64:
+            f.write(struct.pack(f'<{count}q', *map(int, values)))
+            continue
+        text = SEPARATOR.join(values)
+        if text.count(SEPARATOR) != count - 1:
+            raise ValueError(f"column {column!r} contains a NUL character")
+        blob = text.encode('utf-8')
+        f.write(_U32.pack(len(blob)) + blob)
+    return count
+
+
+def export_batches(path, batches, columns=rows.seed.USER_COLUMNS):
+    """Write columnar batches to `path`; returns the number of rows written"""
+    columns = tuple(columns)
+    written = 0
+    with open(path, 'wb') as f:
+        write_header(f, columns)
+        for batch in batches:
+            written += write_batch(f, batch, columns)
+        f.write(_U32.pack(0))
+    return written
+
+
+def export_users(path, batch_size=DEFAULT_BATCH_SIZE, columns=None, filters=()):
+    """Stream user_data in keyset order straight into a binary extract"""
+    columns = tuple(columns or rows.seed.USER_COLUMNS)
+    batches = batch_processing.stream_users_in_batches(
+        batch_size, 'keyset', columns, filters, row_format=rows.COLUMNAR)
+    return export_batches(path, batches, columns)
+
+
+def read_batches(path, row_format=rows.DICT):
+    """
+    Generator that yields the batches stored in `path` in `row_format`
+    ('dict', 'tuple', 'slots' or 'columnar'), as written.
+
+    Integer columns (age) come back as int rather than Decimal.
+    """
+    rows.check_format(row_format, batch=True)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a user_data extract")
+        version, ncols = struct.unpack_from('<HH', data, 4)
+        if version != VERSION:
+            raise ValueError(f"unsupported extract version {version}")
+        pos = 8
+        columns, types = [], []
+        for _ in range(ncols):
+            kind, = _U8.unpack_from(data, pos)
+            length, = _U16.unpack_from(data, pos + 1)
+            columns.append(data[pos + 3:pos + 3 + length].decode('utf-8'))
+            types.append(kind)
+            pos += 3 + length
+        while True:
+            count, = _U32.unpack_from(data, pos)
+            pos += 4
+            if not count:
+                return
+            values = []
+            for kind in types:
+                if kind == INT64:
+                    values.append(list(struct.unpack_from(f'<{count}q', data, pos)))
+                    pos += 8 * count
+                else:
+                    length, = _U32.unpack_from(data, pos)
+                    values.append(data[pos + 4:pos + 4 + length].decode('utf-8').split(SEPARATOR))
+                    pos += 4 + length
+            if row_format == rows.COLUMNAR:
+                yield dict(zip(columns, values))
+            else:
+                yield rows.shape_rows(list(zip(*values)), columns, row_format)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'count'):
+        print("Usage: ./binary_export.py export|count path [batch_size]")
+        sys.exit(1)
+    if sys.argv[1] == 'export':
+        size = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_BATCH_SIZE
+        print(f"✅ Exported {export_users(sys.argv[2], size)} rows to {sys.argv[2]}")
+    else:
+        total = sum(len(next(iter(b.values())))
+                    for b in read_batches(sys.argv[2], rows.COLUMNAR))
+        print(f"{sys.argv[2]}: {total} rows")
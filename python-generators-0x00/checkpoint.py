@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+"""
+checkpoint.py
+Crash-safe checkpoints for long-running streams.
+
+A checkpoint is a small JSON document written to a temporary file next
+to its destination, fsynced and then renamed over it. A crash leaves
+either the old checkpoint or the new one, never a torn file.
+"""
+import os
+import json
+import tempfile
+
+
+def save_checkpoint(path, state):
+    """Atomically replace the checkpoint at `path` with `state`"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Persist the rename itself, not just the file contents
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def load_checkpoint(path):
+    """Return the saved state, or None when there is no checkpoint yet"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
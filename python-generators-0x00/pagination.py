@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+"""
+pagination.py
+Keyset (seek) pagination over user_data.
+
+LIMIT/OFFSET makes the server walk and discard `offset` rows for every
+page, so a full scan costs O(n^2). Seeking on the user_id primary key
+(`WHERE user_id > last_seen ORDER BY user_id LIMIT n`) lets every page
+start with an index lookup, so each page costs the same.
+
+Queries are built from an optional column projection and a list of
+(column, operator, value) filters, so callers only pull the rows and
+columns they need over the wire.
+"""
+seed = __import__('seed')
+rows = __import__('rows')
+
+OFFSET = "offset"
+KEYSET = "keyset"
+MODES = (OFFSET, KEYSET)
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+
+def projection(columns=None, mode=OFFSET):
+    """
+    Return the validated SELECT column list.
+
+    Keyset pages need user_id to seek from, so it is added when missing.
+    """
+    columns = list(columns or seed.USER_COLUMNS)
+    for column in columns:
+        if column not in seed.USER_COLUMNS:
+            raise ValueError(f"unknown column {column!r}")
+    if mode == KEYSET and 'user_id' not in columns:
+        columns.append('user_id')
+    return columns
+
+
+def predicate(filters=()):
+    """Turn (column, operator, value) filters into WHERE conditions and params"""
+    conditions, params = [], []
+    for column, operator, value in filters:
+        if column not in seed.USER_COLUMNS:
+            raise ValueError(f"unknown column {column!r}")
+        if operator not in OPERATORS:
+            raise ValueError(f"operator must be one of {OPERATORS}, got {operator!r}")
+        conditions.append(f"{column} {operator} %s")
+        params.append(value)
+    return conditions, params
+
+
+def build_query(page_size, mode=OFFSET, position=None, columns=None, filters=()):
+    """
+    Return (sql, params) fetching one page of user_data.
+
+    `position` is the row offset in offset mode, or the last user_id seen
+    in keyset mode (None for the first page).
+    """
+    check_mode(mode)
+    conditions, params = predicate(filters)
+    if mode == KEYSET and position is not None:
+        conditions.append("user_id > %s")
+        params.append(position)
+    sql = f"SELECT {', '.join(projection(columns, mode))} FROM {seed.TABLE_NAME}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if mode == KEYSET:
+        sql += " ORDER BY user_id LIMIT %s"
+        params.append(page_size)
+    else:
+        sql += " LIMIT %s OFFSET %s"
+        params += [page_size, position or 0]
+    return sql, tuple(params)
+
+
+def fetch_rows(sql, params, connection=None):
+    """
+    Run a page query and return (column_names, rows as tuples).
+
+    Uses `connection` when given, otherwise opens and closes its own.
+    """
+    owned = connection is None
+    if owned:
+        connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        page = cursor.fetchall()
+        return cursor.column_names, page
+    finally:
+        cursor.close()
+        if owned:
+            connection.close()
+
+
+def fetch_page(sql, params, connection=None, row_format=rows.DICT):
+    """Run a page query and return its rows in `row_format`"""
+    columns, page = fetch_rows(sql, params, connection)
+    return rows.shape_rows(page, columns, row_format)
+
+
+def paginate_users_after(page_size, last_seen=None, connection=None,
+                         columns=None, filters=(), row_format=rows.DICT):
+    """Fetch the page of users whose user_id sorts after `last_seen`"""
+    sql, params = build_query(page_size, KEYSET, last_seen, columns, filters)
+    return fetch_page(sql, params, connection, row_format)
+
+
+def positioned_pages(page_size, mode=OFFSET, connection=None, columns=None,
+                     filters=(), row_format=rows.DICT, position=None):
+    """
+    Generator that yields (page, next_position) pairs until the table is
+    exhausted.
+
+    `next_position` is what to pass as `position` to resume after that
+    page: a row offset, or the last user_id seen in keyset mode.
+    """
+    check_mode(mode)
+    rows.check_format(row_format, batch=True)
+    if mode == OFFSET:
+        position = position or 0
+    while True:
+        sql, params = build_query(page_size, mode, position, columns, filters)
+        names, page = fetch_rows(sql, params, connection)
+        if not page:
+            break
+        if mode == KEYSET:
+            position = page[-1][names.index('user_id')]
+        else:
+            position += len(page)
+        yield rows.shape_rows(page, names, row_format), position
+        if mode == KEYSET and len(page) < page_size:
+            break
+
+
+def pages(page_size, mode=OFFSET, connection=None, columns=None, filters=(),
+          row_format=rows.DICT, position=None):
+    """
+    Generator that yields pages of users until the table is exhausted.
+
+    Pages come out in `row_format` ('dict', 'tuple', 'slots' or
+    'columnar'). `position` resumes from a row offset or a user_id.
+    """
+    for page, _ in positioned_pages(page_size, mode, connection, columns,
+                                    filters, row_format, position):
+        yield page
+
+
+def keyset_pages(page_size, last_seen=None, connection=None,
+                 columns=None, filters=(), row_format=rows.DICT):
+    """Generator that yields pages of users in user_id order"""
+    return pages(page_size, KEYSET, connection, columns, filters,
+                 row_format, last_seen)
+
+
+def check_mode(mode):
+    """Raise ValueError for an unknown pagination mode"""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
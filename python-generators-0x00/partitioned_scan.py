@@ -0,0 +1,179 @@
+#!/usr/bin/python3
+"""
+partitioned_scan.py
+Parallel range-partitioned scan of user_data.
+
+The user_id key space is cut into N ranges holding roughly the same
+number of rows. Each range is scanned with keyset pagination by its own
+process on its own connection, and the batches are merged back into one
+generator, either in user_id order or as soon as any worker has one.
+
+Usage: ./partitioned_scan.py [partitions] [batch_size]
+"""
+import os
+import sys
+import time
+import queue
+import multiprocessing
+
+seed = __import__('seed')
+pagination = __import__('pagination')
+
+DEFAULT_BATCH_SIZE = 1000
+QUEUE_DEPTH = 4  # Batches a worker may get ahead of the consumer
+POLL_INTERVAL = 1.0  # Seconds between checks for workers that died silently
+
+
+def partition_bounds(partitions):
+    """
+    Return [(lower, upper), ...] user_id ranges of roughly equal size.
+
+    Each range holds the keys with lower < user_id <= upper; None means
+    unbounded. Fewer ranges come back when the table has fewer rows.
+    """
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise ConnectionError(f"could not connect to {seed.DB_NAME}")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {seed.TABLE_NAME}")
+        count = cursor.fetchone()[0]
+        cuts = []
+        for i in range(1, partitions):
+            offset = i * count // partitions - 1
+            if offset < 0:
+                continue
+            cursor.execute(
+                f"SELECT user_id FROM {seed.TABLE_NAME} "
+                "ORDER BY user_id LIMIT 1 OFFSET %s", (offset,))
+            key = cursor.fetchone()[0]
+            if not cuts or key != cuts[-1]:
+                cuts.append(key)
+    finally:
+        cursor.close()
+        connection.close()
+    edges = [None] + cuts + [None]
+    return list(zip(edges, edges[1:]))
+
+
+def batch_length(batch):
+    """Rows in a batch of any row_format"""
+    if isinstance(batch, dict):
+        return len(next(iter(batch.values()), ()))
+    return len(batch)
+
+
+def scan_partition(index, lower, upper, batch_size, columns, filters, row_format, out):
+    """
+    Worker process: stream one key range into `out`.
+
+    Sends ('batch', rows) messages, then one ('done', stats) or
+    ('error', message), all tagged with the partition index.
+    """
+    start = time.perf_counter()
+    scanned = 0
+    connection = seed.connect_to_prodev(pooled=False)
+    try:
+        if not connection:
+            raise ConnectionError(f"could not connect to {seed.DB_NAME}")
+        bounded = list(filters) + ([('user_id', '<=', upper)] if upper is not None else [])
+        for batch in pagination.pages(batch_size, pagination.KEYSET, connection,
+                                      columns, bounded, row_format, lower):
+            out.put((index, 'batch', batch))
+            scanned += batch_length(batch)
+        elapsed = time.perf_counter() - start
+        out.put((index, 'done', {
+            'partition': index, 'lower': lower, 'upper': upper, 'rows': scanned,
+            'seconds': elapsed, 'rows_per_sec': scanned / elapsed if elapsed else 0,
+        }))
+    except Exception as e:
+        out.put((index, 'error', f"{type(e).__name__}: {e}"))
+    finally:
+        if connection:
+            connection.close()
+
+
+def drain(messages, workers, report):
+    """
+    Yield batches from `messages` until every worker in `workers`
+    ({partition index: Process}) has reported done.
+
+    A worker that exits without reporting (killed, crashed on start)
+    raises RuntimeError once the queue has stayed empty for a whole
+    POLL_INTERVAL after its exit, so its last messages are not missed.
+    """
+    pending = dict(workers)
+    exited = set()
+    while pending:
+        try:
+            index, kind, payload = messages.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            dead = {i for i, worker in pending.items() if worker.exitcode is not None}
+            for i in sorted(dead & exited):
+                raise RuntimeError(
+                    f"partition {i} worker exited with code {pending[i].exitcode} "
+                    "without finishing")
+            exited = dead
+            continue
+        if kind == 'batch':
+            yield payload
+        elif kind == 'done':
+            pending.pop(index, None)
+            if report is not None:
+                report.append(payload)
+        else:
+            raise RuntimeError(f"partition {index} failed: {payload}")
+
+
+def partitioned_scan(partitions=os.cpu_count(), batch_size=DEFAULT_BATCH_SIZE,
+                     ordered=False, columns=None, filters=(), row_format='dict',
+                     report=None):
+    """
+    Generator that yields batches of users scanned by `partitions`
+    worker processes.
+
+    ordered=True yields whole partitions in user_id order (later workers
+    wait on their bounded queues meanwhile); otherwise batches come out
+    as they arrive. When `report` is a list, each worker appends its
+    rows, seconds and rows_per_sec. Closing the generator stops the
+    workers.
+    """
+    bounds = partition_bounds(partitions)
+    # Spawned workers start clean instead of inheriting pooled sockets
+    context = multiprocessing.get_context('spawn')
+    if ordered:
+        queues = [context.Queue(QUEUE_DEPTH) for _ in bounds]
+    else:
+        queues = [context.Queue(QUEUE_DEPTH * len(bounds))] * len(bounds)
+    workers = [
+        context.Process(
+            target=scan_partition, daemon=True,
+            args=(i, lower, upper, batch_size, columns, tuple(filters), row_format, queues[i]))
+        for i, (lower, upper) in enumerate(bounds)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        if ordered:
+            for i, messages in enumerate(queues):
+                yield from drain(messages, {i: workers[i]}, report)
+        else:
+            yield from drain(queues[0], dict(enumerate(workers)), report)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+
+if __name__ == "__main__":
+    partitions = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH_SIZE
+    report = []
+    start = time.perf_counter()
+    total = sum(batch_length(b) for b in partitioned_scan(partitions, batch_size, report=report))
+    elapsed = time.perf_counter() - start
+    for stats in sorted(report, key=lambda s: s['partition']):
+        print(f"partition {stats['partition']}: {stats['rows']} rows in "
+              f"{stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s)")
+    print(f"total: {total} rows in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)")
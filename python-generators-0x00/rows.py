@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+rows.py
+Row shapes for streamed user_data rows.
+
+Rows are fetched from the cursor as plain tuples and shaped once:
+- dict: {column: value}, the default and what cursor(dictionary=True) gave
+- tuple: the raw tuple; column_index(columns) maps names to positions
+- slots: a UserRow, with attribute and item access but no per-row dict
+- columnar: batches only, one list per column, {column: [values]}
+"""
+seed = __import__('seed')
+
+DICT = 'dict'
+TUPLE = 'tuple'
+SLOTS = 'slots'
+COLUMNAR = 'columnar'
+ROW_FORMATS = (DICT, TUPLE, SLOTS)
+BATCH_FORMATS = ROW_FORMATS + (COLUMNAR,)
+
+
+class UserRow:
+    """A user_data row without a per-instance __dict__"""
+
+    __slots__ = seed.USER_COLUMNS
+
+    def __init__(self, user_id=None, name=None, email=None, age=None):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __getitem__(self, column):
+        """Allow row['age'] so code written for dict rows keeps working"""
+        if column not in self.__slots__:
+            raise KeyError(column)
+        return getattr(self, column)
+
+    def __eq__(self, other):
+        if not isinstance(other, UserRow):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __repr__(self):
+        fields = ', '.join(f"{c}={getattr(self, c)!r}" for c in self.__slots__)
+        return f"UserRow({fields})"
+
+    def astuple(self):
+        return tuple(getattr(self, c) for c in self.__slots__)
+
+    def asdict(self):
+        return {c: getattr(self, c) for c in self.__slots__}
+
+
+def column_index(columns=seed.USER_COLUMNS):
+    """Shared {column: position} index for tuple rows"""
+    return {column: i for i, column in enumerate(columns)}
+
+
+def check_format(row_format, batch=False):
+    """Raise ValueError for a shape the caller cannot produce"""
+    allowed = BATCH_FORMATS if batch else ROW_FORMATS
+    if row_format not in allowed:
+        raise ValueError(f"row_format must be one of {allowed}, got {row_format!r}")
+
+
+def shape_rows(rows, columns, row_format=DICT):
+    """Turn a list of cursor tuples into a batch of the requested shape"""
+    columns = tuple(columns)
+    if row_format == DICT:
+        return [dict(zip(columns, row)) for row in rows]
+    if row_format == TUPLE:
+        return [tuple(row) for row in rows]
+    if row_format == SLOTS:
+        if columns == seed.USER_COLUMNS:
+            return [UserRow(*row) for row in rows]
+        return [UserRow(**dict(zip(columns, row))) for row in rows]
+    if row_format == COLUMNAR:
+        values = list(zip(*rows)) or [()] * len(columns)
+        return {column: list(v) for column, v in zip(columns, values)}
+    check_format(row_format, batch=True)
@@ -1,12 +1,31 @@
+import io
 import os
 import csv
+import mmap
+import argparse
+import time
+import queue
+import itertools
+import multiprocessing
 import uuid
-import mysql.connector
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# SEED_BACKEND=sqlite swaps MySQL for a local SQLite file through
+# sqlite_shim, which is what benchmark.py runs against.
+DB_BACKEND = os.getenv('SEED_BACKEND', 'mysql')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'user_data.sqlite3')
+if DB_BACKEND == 'sqlite':
+    import sqlite_shim as connector
+else:
+    import mysql.connector as connector
+
 # Environment Variables
 MYSQL_HOST = os.getenv('MYSQL_HOST')
 MYSQL_PORT = int(os.getenv('MYSQL_PORT', 3306))
@@ -17,19 +36,33 @@ MYSQL_DATABASE = os.getenv('MYSQL_DATABASE')
 DB_NAME = MYSQL_DATABASE
 TABLE_NAME = 'user_data'
 
-def get_connection(database=None):
-    return mysql.connector.connect(
+# Connection pool sizing, see ConnectionPool
+POOL_MIN_SIZE = int(os.getenv('MYSQL_POOL_MIN_SIZE', 1))
+POOL_MAX_SIZE = int(os.getenv('MYSQL_POOL_MAX_SIZE', 10))
+POOL_IDLE_TIMEOUT = float(os.getenv('MYSQL_POOL_IDLE_TIMEOUT', 300))
+POOL_WAIT_TIMEOUT = float(os.getenv('MYSQL_POOL_WAIT_TIMEOUT', 30))
+
+# Rows sent per executemany() and committed together by insert_data
+INSERT_BATCH_SIZE = int(os.getenv('SEED_INSERT_BATCH_SIZE', 5000))
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+# Bytes CsvScanner decodes and splits at a time
+CSV_WINDOW_SIZE = int(os.getenv('SEED_CSV_WINDOW_SIZE', 4 * 1024 * 1024))
+# Maintained by MySQL on every insert and update; drives incremental streams
+WATERMARK_COLUMN = 'updated_at'
+
+def get_connection(database=None, **options):
+    if DB_BACKEND == 'sqlite':
+        return connector.connect(SQLITE_PATH, **options)
+    params = dict(
         host=MYSQL_HOST,
         port=MYSQL_PORT,
         user=MYSQL_USER,
         password=MYSQL_PASSWORD,
-        database=database
-    ) if database else mysql.connector.connect(
-        host=MYSQL_HOST,
-        port=MYSQL_PORT,
-        user=MYSQL_USER,
-        password=MYSQL_PASSWORD
+        **options
     )
+    if database:
+        params['database'] = database
+    return connector.connect(**params)
 
 def connect_db():
     try:
@@ -49,9 +82,196 @@ def create_database(connection):
     except Exception as e:
         print(f"❌ Failed to create database: {e}")
 
-def connect_to_prodev():
+class PoolExhausted(Exception):
+    """Raised when no pooled connection frees up within the wait timeout"""
+
+class PooledConnection:
+    """Proxy around a borrowed connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQL connections.
+
+    Keeps at least `min_size` connections open and never more than
+    `max_size`. Idle connections beyond `min_size` are closed after
+    `idle_timeout` seconds, every borrowed connection is pinged first,
+    and borrowers wait up to `wait_timeout` seconds when the pool is full.
+    """
+
+    def __init__(self, factory, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, wait_timeout=POOL_WAIT_TIMEOUT):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("pool sizes must satisfy 0 <= min_size <= max_size, max_size >= 1")
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._idle = deque()  # (connection, released_at), most recent on the right
+        self._size = 0  # open connections, idle and borrowed
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {
+            'created': 0, 'borrowed': 0, 'discarded': 0, 'waits': 0,
+            'wait_time': 0.0, 'max_waiting': 0, 'timeouts': 0,
+        }
+        for _ in range(min_size):
+            self._idle.append((self._create(), time.monotonic()))
+            self._size += 1
+
+    def _create(self):
+        connection = self.factory()
+        with self._cond:
+            self.stats['created'] += 1
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass  # Already broken, nothing left to release
+        with self._cond:
+            self._size -= 1
+            self.stats['discarded'] += 1
+            self._cond.notify()
+
+    def _expired_idle(self):
+        """Pop idle connections past idle_timeout, keeping min_size open"""
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        while (self._idle and self._idle[0][1] < cutoff
+               and self._size - len(expired) > self.min_size):
+            expired.append(self._idle.popleft()[0])
+        return expired
+
+    def acquire(self):
+        """Borrow a healthy connection, wrapped in a PooledConnection"""
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            connection, create, expired = None, False, []
+            with self._cond:
+                started = None
+                while True:
+                    if self._closed:
+                        if started is not None:
+                            self.stats['wait_time'] += time.monotonic() - started
+                        raise RuntimeError("connection pool is closed")
+                    expired = self._expired_idle()
+                    if self._idle:
+                        connection = self._idle.pop()[0]
+                        break
+                    if self._size - len(expired) < self.max_size:
+                        create = True
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        if started is not None:
+                            self.stats['wait_time'] += time.monotonic() - started
+                        raise PoolExhausted(
+                            f"no connection free after {self.wait_timeout}s")
+                    if started is None:
+                        started = time.monotonic()
+                        self.stats['waits'] += 1
+                    self._waiting += 1
+                    self.stats['max_waiting'] = max(self.stats['max_waiting'], self._waiting)
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if started is not None:
+                    self.stats['wait_time'] += time.monotonic() - started
+            for stale in expired:
+                self._discard(stale)
+
+            if create:
+                try:
+                    connection = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(connection):
+                self._discard(connection)
+                continue
+            with self._cond:
+                self.stats['borrowed'] += 1
+            return PooledConnection(self, connection)
+
+    @staticmethod
+    def _healthy(connection):
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def release(self, connection):
+        """Return a connection; one left mid-transaction or mid-result is dropped"""
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        with self._cond:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._cond.notify()
+                return
+            self._size -= 1
+        connection.close()
+
+    def metrics(self):
+        """Snapshot of pool occupancy and wait-queue counters"""
+        with self._cond:
+            return dict(self.stats, size=self._size, idle=len(self._idle),
+                        in_use=self._size - len(self._idle),
+                        waiting=self._waiting)
+
+    def close(self):
+        """Close every idle connection; borrowed ones close on release"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            connection.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the process-wide pool for DB_NAME, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(lambda: get_connection(DB_NAME))
+        return _pool
+
+def connect_to_prodev(pooled=True):
     try:
-        conn = get_connection(DB_NAME)
+        conn = get_pool().acquire() if pooled else get_connection(DB_NAME)
         print(f"✅ Connected to database '{DB_NAME}'.")
         return conn
     except Exception as e:
@@ -67,42 +287,469 @@ def create_table(connection):
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
             age DECIMAL NOT NULL,
-            INDEX idx_user_id (user_id)
+            {WATERMARK_COLUMN} TIMESTAMP(6) NOT NULL
+                DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+            INDEX idx_user_id (user_id),
+            INDEX idx_{WATERMARK_COLUMN} ({WATERMARK_COLUMN}, user_id)
         )
         """
         cursor.execute(query)
         connection.commit()
         print(f"✅ Table '{TABLE_NAME}' ensured.")
         cursor.close()
+        ensure_watermark(connection)
     except Exception as e:
         print(f"❌ Failed to create table: {e}")
 
-def insert_data(connection, data):
+def ensure_watermark(connection):
+    """
+    Add the updated_at watermark column to a table created before it
+    existed. Existing rows get the current time, so the next incremental
+    run streams them once.
+    """
     cursor = connection.cursor()
-    for record in data:
-        user_id = record.get('user_id') or str(uuid.uuid4())
-        name = record['name']
-        email = record['email']
-        age = record['age']
-
-        # Check if user_id exists
-        cursor.execute(f"SELECT 1 FROM {TABLE_NAME} WHERE user_id = %s", (user_id,))
-        if cursor.fetchone():
-            print(f"⚠️ Skipping existing user_id {user_id}")
-            continue
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+            (TABLE_NAME, WATERMARK_COLUMN))
+        if cursor.fetchone()[0]:
+            return
+        cursor.execute(f"""
+        ALTER TABLE {TABLE_NAME}
+            ADD COLUMN {WATERMARK_COLUMN} TIMESTAMP(6) NOT NULL
+                DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+            ADD INDEX idx_{WATERMARK_COLUMN} ({WATERMARK_COLUMN}, user_id)
+        """)
+        connection.commit()
+        print(f"✅ Added watermark column '{WATERMARK_COLUMN}' to '{TABLE_NAME}'.")
+    finally:
+        cursor.close()
+
+def record_values(record):
+    """
+    Validate a CSV record and turn it into an INSERT parameter tuple.
 
-        insert_query = f"""
-        INSERT INTO {TABLE_NAME} (user_id, name, email, age)
+    Fills in a missing user_id; raises ValueError for a missing name or
+    email or an age that is not a non-negative number.
+    """
+    name = (record.get('name') or '').strip()
+    email = (record.get('email') or '').strip()
+    if not name or not email:
+        raise ValueError("name and email are required")
+    try:
+        age = Decimal(record.get('age') or '')
+    except InvalidOperation:
+        raise ValueError(f"invalid age {record.get('age')!r}") from None
+    if not age.is_finite() or age < 0:
+        raise ValueError(f"invalid age {record.get('age')!r}")
+    return (record.get('user_id') or str(uuid.uuid4()), name, email, age)
+
+def insert_query(on_duplicate='ignore'):
+    """INSERT statement that skips or overwrites existing user_ids"""
+    columns = ', '.join(USER_COLUMNS)
+    if on_duplicate == 'ignore':
+        return f"""
+        INSERT IGNORE INTO {TABLE_NAME} ({columns})
         VALUES (%s, %s, %s, %s)
         """
-        cursor.execute(insert_query, (user_id, name, email, age))
-        print(f"✅ Inserted user: {name} ({user_id})")
+    if on_duplicate == 'update':
+        return f"""
+        INSERT INTO {TABLE_NAME} ({columns})
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            name = VALUES(name), email = VALUES(email), age = VALUES(age)
+        """
+    raise ValueError(f"on_duplicate must be 'ignore' or 'update', got {on_duplicate!r}")
 
-    connection.commit()
-    cursor.close()
+def insert_batches(connection, batches, on_duplicate='ignore'):
+    """
+    Insert each batch of parameter tuples with executemany and commit it.
 
-def load_csv_data(csv_path):
+    Prints one throughput summary and returns the number of rows sent.
+    """
+    query = insert_query(on_duplicate)
+    cursor = connection.cursor()
+    sent = affected = 0
+    start = time.perf_counter()
     try:
+        for batch in batches:
+            cursor.executemany(query, batch)
+            connection.commit()
+            sent += len(batch)
+            affected += max(cursor.rowcount, 0)
+    finally:
+        cursor.close()
+    elapsed = time.perf_counter() - start
+    rate = sent / elapsed if elapsed else 0
+    print(f"✅ Sent {sent} rows ({affected} affected) in {elapsed:.2f}s "
+          f"({rate:,.0f} rows/s)")
+    return sent
+
+def insert_data(connection, data, batch_size=INSERT_BATCH_SIZE, on_duplicate='ignore'):
+    """
+    Insert records in batches of `batch_size`, committing after each batch.
+
+    Existing user_ids are skipped (on_duplicate='ignore') or overwritten
+    (on_duplicate='update'). `data` can be any iterable of records, so a
+    csv.DictReader is consumed lazily. Returns the number of records sent.
+    """
+    records = iter(data)
+    batches = iter(
+        lambda: [record_values(r) for r in itertools.islice(records, batch_size)], [])
+    return insert_batches(connection, batches, on_duplicate)
+
+def validated_batches(reader, batch_size, errors=None):
+    """
+    Generator that yields lists of at most `batch_size` validated records
+    from a csv.DictReader.
+
+    Invalid rows are skipped; their (line, reason) pairs are appended to
+    `errors` when given, otherwise printed.
+    """
+    batch = []
+    for record in reader:
+        try:
+            batch.append(record_values(record))
+        except ValueError as e:
+            if errors is None:
+                print(f"⚠️ Skipping line {reader.line_num}: {e}")
+            else:
+                errors.append((reader.line_num, str(e)))
+            continue
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class CsvScanner:
+    """
+    Memory-mapped CSV reader, a drop-in for csv.DictReader over a file.
+
+    Works through the file in CSV_WINDOW_SIZE windows cut at line breaks:
+    each window is decoded once and split into lines and fields with str
+    methods instead of running the csv state machine per character. A
+    window holding a quote or a bare carriage return, or a header other
+    than user_id,name,email,age, hands the rest of the file to
+    csv.DictReader from that window's start.
+    """
+
+    def __init__(self, csv_path, window=CSV_WINDOW_SIZE):
+        self.csv_path = csv_path
+        self.window = window
+        self.fieldnames = None
+        self.line_num = 0
+        self._records = self._scan()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._records)
+
+    def close(self):
+        self._records.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _scan(self):
+        with open(self.csv_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                pos = data.find(b'\n') + 1 or size
+                header = data[:pos]
+                if b'"' in header or header.rstrip(b'\r\n') != ','.join(USER_COLUMNS).encode():
+                    yield from self._csv_records(f, 0)
+                    return
+                self.fieldnames = list(USER_COLUMNS)
+                self.line_num = 1
+                while pos < size:
+                    end = self._window_end(data, pos, size)
+                    chunk = data[pos:end]
+                    if b'"' in chunk or b'\r' in chunk.replace(b'\r\n', b''):
+                        yield from self._csv_records(f, pos)
+                        return
+                    lines = chunk.decode('utf-8').split('\n')
+                    if lines[-1] == '':
+                        lines.pop()
+                    for line in lines:
+                        self.line_num += 1
+                        fields = line.rstrip('\r').split(',')
+                        if len(fields) == 4:
+                            yield dict(zip(USER_COLUMNS, fields))
+                        elif fields != ['']:  # csv.DictReader skips blank lines
+                            yield self._ragged(fields)
+                    pos = end
+
+    def _window_end(self, data, pos, size):
+        """End of the window starting at `pos`: just past its last line break"""
+        limit = pos + self.window
+        if limit >= size:
+            return size
+        return data.rfind(b'\n', pos, limit) + 1 or data.find(b'\n', limit) + 1 or size
+
+    def _ragged(self, fields):
+        """A row with the wrong field count, shaped the way csv.DictReader does"""
+        record = dict(zip(USER_COLUMNS, fields))
+        if len(fields) > len(USER_COLUMNS):
+            record[None] = fields[len(USER_COLUMNS):]
+        for column in USER_COLUMNS[len(fields):]:
+            record[column] = None
+        return record
+
+    def _csv_records(self, f, offset):
+        """Fallback: csv.DictReader from byte `offset`, a line start"""
+        base = self.line_num
+        f.seek(offset)
+        text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+        try:
+            reader = csv.DictReader(text, fieldnames=self.fieldnames)
+            for record in reader:
+                self.fieldnames = reader.fieldnames
+                self.line_num = base + reader.line_num
+                yield record
+        finally:
+            text.detach()
+
+def stream_csv_data(csv_path, batch_size=INSERT_BATCH_SIZE, scanner='mmap'):
+    """
+    Generator that yields lists of at most `batch_size` validated records.
+
+    Records come out as record_values() tuples; invalid rows are reported
+    and skipped. Only one batch is held in memory at a time. The file is
+    read with CsvScanner, or with csv.DictReader when scanner='csv'.
+    """
+    if scanner == 'mmap':
+        with CsvScanner(csv_path) as reader:
+            yield from validated_batches(reader, batch_size)
+        return
+    if scanner != 'csv':
+        raise ValueError(f"scanner must be 'mmap' or 'csv', got {scanner!r}")
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        yield from validated_batches(csv.DictReader(f), batch_size)
+
+_ITEM, _ERROR, _DONE = 'item', 'error', 'done'
+
+def read_ahead(iterable, depth=2):
+    """
+    Generator that yields the items of `iterable`, producing them on a
+    background thread that keeps up to `depth` items queued.
+
+    The producer blocks when the queue is full. Exceptions it hits are
+    re-raised in the consumer, and closing this generator stops the
+    thread, which then closes `iterable` if it is a generator.
+    """
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                items.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        source = iter(iterable)
+        try:
+            for item in source:
+                if not put((_ITEM, item)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_ERROR, e))
+        finally:
+            close = getattr(source, 'close', None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, name='read_ahead', daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, payload = items.get()
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise payload
+            yield payload
+    finally:
+        stop.set()
+        producer.join()
+
+def bulk_load_csv(connection, csv_path, batch_size=INSERT_BATCH_SIZE, on_duplicate='ignore'):
+    """
+    Stream a CSV into the table in batches.
+
+    Parsing runs on a background thread one batch ahead of the inserts,
+    so CSV decoding overlaps with database round trips.
+    """
+    try:
+        batches = read_ahead(stream_csv_data(csv_path, batch_size))
+        return insert_batches(connection, batches, on_duplicate)
+    except FileNotFoundError:
+        print(f"❌ File not found: {csv_path}")
+        return 0
+
+def csv_shards(csv_path, shards):
+    """
+    Split the rows of a CSV into at most `shards` (start, end) byte ranges.
+
+    A shard owns every line that starts inside its range, so ranges can
+    cut lines anywhere. Assumes no quoted field spans a line break.
+    """
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+    step = max((size - data_start) // shards, 1)
+    bounds = [min(data_start + i * step, size) for i in range(shards)] + [size]
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if lo < hi]
+
+def first_line_start(f, start):
+    """Seek `f` to the first line starting at or after byte `start`"""
+    f.seek(max(start - 1, 0))
+    if start > 0:
+        f.readline()  # Finish the line the previous shard owns
+    return f.tell()
+
+def lines_before(csv_path, start):
+    """Number of lines in the file before the first one a shard at `start` owns"""
+    with open(csv_path, 'rb') as f:
+        remaining = first_line_start(f, start)
+        f.seek(0)
+        count = 0
+        while remaining > 0:
+            chunk = f.read(min(remaining, CSV_WINDOW_SIZE))
+            if not chunk:
+                break
+            count += chunk.count(b'\n')
+            remaining -= len(chunk)
+        return count
+
+def read_shard_lines(csv_path, start, end):
+    """Generator that yields the decoded lines starting in [start, end)"""
+    with open(csv_path, 'rb') as f:
+        first_line_start(f, start)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+def load_shard(csv_path, start, end, batch_size=INSERT_BATCH_SIZE, on_duplicate='ignore'):
+    """
+    Process-pool worker: load one byte range of a CSV on its own connection.
+
+    Returns a report dict with the rows sent and the skipped lines,
+    numbered from the start of the file.
+    """
+    report = {'shard': (start, end), 'sent': 0, 'errors': []}
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader([f.readline()]))
+    connection = connect_to_prodev(pooled=False)
+    if not connection:
+        report['errors'].append((None, 'could not connect'))
+        return report
+    try:
+        reader = csv.DictReader(read_shard_lines(csv_path, start, end), fieldnames=header)
+        batches = read_ahead(validated_batches(reader, batch_size, report['errors']))
+        report['sent'] = insert_batches(connection, batches, on_duplicate)
+    except Exception as e:
+        report['errors'].append((None, f"shard failed: {e}"))
+    finally:
+        connection.close()
+    if any(line for line, _ in report['errors']):
+        # The reader counts from the shard's first line; only pay for the
+        # newline count up to it when there is something to report
+        offset = lines_before(csv_path, start)
+        report['errors'] = [(line and line + offset, reason)
+                            for line, reason in report['errors']]
+    return report
+
+def parallel_load_csv(csv_path, workers, batch_size=INSERT_BATCH_SIZE, on_duplicate='ignore'):
+    """
+    Load a CSV with `workers` processes, one byte-range shard and one
+    connection each, then merge their reports.
+
+    Returns the merged report: total rows sent and every skipped line.
+    """
+    if not os.path.exists(csv_path):
+        print(f"❌ File not found: {csv_path}")
+        return {'sent': 0, 'errors': []}
+    start = time.perf_counter()
+    merged = {'sent': 0, 'errors': []}
+    # Spawned workers start clean instead of inheriting pooled sockets
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(load_shard, csv_path, lo, hi, batch_size, on_duplicate)
+            for lo, hi in csv_shards(csv_path, workers)
+        ]
+        for future in futures:
+            report = future.result()
+            merged['sent'] += report['sent']
+            merged['errors'].extend(
+                (report['shard'], line, reason) for line, reason in report['errors'])
+    elapsed = time.perf_counter() - start
+    rate = merged['sent'] / elapsed if elapsed else 0
+    print(f"✅ {len(futures)} workers sent {merged['sent']} rows in {elapsed:.2f}s "
+          f"({rate:,.0f} rows/s), {len(merged['errors'])} rows skipped")
+    for shard, line, reason in merged['errors']:
+        where = f"line {line}" if line else f"shard {shard}"
+        print(f"⚠️ Skipped {where}: {reason}")
+    return merged
+
+def load_data_infile(csv_path):
+    """
+    Fast path: have the server parse the CSV with LOAD DATA LOCAL INFILE.
+
+    Needs local_infile enabled on the server. Duplicate user_ids are
+    skipped and a missing user_id column is filled with UUID().
+    """
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        first_line = f.readline()
+    header = next(csv.reader([first_line]))
+    line_end = '\\r\\n' if first_line.endswith('\r\n') else '\\n'
+    targets = [c if c in USER_COLUMNS else '@skip' for c in header]
+    set_clause = '' if 'user_id' in header else ' SET user_id = UUID()'
+
+    connection = get_connection(DB_NAME, allow_local_infile=True)
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {TABLE_NAME} "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            f"LINES TERMINATED BY '{line_end}' IGNORE 1 LINES "
+            f"({', '.join(targets)}){set_clause}",
+            (os.path.abspath(csv_path),))
+        connection.commit()
+        loaded = cursor.rowcount
+    finally:
+        cursor.close()
+        connection.close()
+    elapsed = time.perf_counter() - start
+    rate = loaded / elapsed if elapsed else 0
+    print(f"✅ Loaded {loaded} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return loaded
+
+def load_csv_data(csv_path, scanner='mmap'):
+    try:
+        if scanner == 'mmap':
+            with CsvScanner(csv_path) as reader:
+                return list(reader)
         with open(csv_path, newline='', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             return list(reader)
@@ -111,6 +758,13 @@ def load_csv_data(csv_path):
         return []
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Create {TABLE_NAME} and load it from a CSV")
+    parser.add_argument('csv_path', nargs='?', default='data/user_data.csv')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes loading byte-range shards in parallel")
+    parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE)
+    args = parser.parse_args()
+
     # Step 1: Connect without database to create it
     conn = connect_db()
     if conn:
@@ -121,7 +775,12 @@ if __name__ == "__main__":
         conn = connect_to_prodev()
         if conn:
             create_table(conn)
-            # Step 3: Load and insert CSV data
-            data = load_csv_data('data/user_data.csv')
-            insert_data(conn, data)
             conn.close()
+            # Step 3: Stream the CSV into the table in batches
+            if args.workers > 1:
+                parallel_load_csv(args.csv_path, args.workers, args.batch_size)
+            else:
+                conn = connect_to_prodev()
+                if conn:
+                    bulk_load_csv(conn, args.csv_path, args.batch_size)
+                    conn.close()
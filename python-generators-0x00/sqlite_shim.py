@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+"""
+sqlite_shim.py
+Just enough of the mysql.connector API over sqlite3 to run the
+generators against a local file (selected with SEED_BACKEND=sqlite).
+
+Only the SQL this project issues is translated: %s placeholders,
+INSERT IGNORE and NOW(6) - INTERVAL n SECOND. SQLite cursors step
+through results lazily, so every cursor behaves like an unbuffered one.
+"""
+import sqlite3
+from decimal import Decimal
+
+Error = sqlite3.Error
+
+sqlite3.register_adapter(Decimal, str)
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%f'
+TRANSLATIONS = (
+    ("NOW(6) - INTERVAL %s SECOND",
+     f"strftime('{TIMESTAMP_FORMAT}', 'now', '-' || %s || ' seconds')"),
+    ("INSERT IGNORE", "INSERT OR IGNORE"),
+    ("%s", "?"),
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id VARCHAR(36) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    age DECIMAL NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('{TIMESTAMP_FORMAT}', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_updated_at ON user_data (updated_at, user_id);
+"""
+
+
+def translate(sql):
+    for mysql_sql, sqlite_sql in TRANSLATIONS:
+        sql = sql.replace(mysql_sql, sqlite_sql)
+    return sql
+
+
+class Cursor:
+    """mysql.connector-style cursor; dictionary=True yields dict rows"""
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def column_names(self):
+        description = self._cursor.description or ()
+        return tuple(column[0] for column in description)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(translate(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(translate(sql), seq_params)
+
+    def _shape(self, rows):
+        if not self._dictionary:
+            return rows
+        columns = self.column_names
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._shape([row])[0]
+
+    def fetchmany(self, size=1):
+        return self._shape(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._shape(self._cursor.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    """mysql.connector-style connection around one sqlite3 connection"""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._open = True
+
+    def cursor(self, dictionary=False, buffered=None):
+        return Cursor(self._connection, dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        self._connection.close()
+        self._open = False
+
+
+def connect(path, **options):
+    """Open `path`, creating user_data if needed; MySQL-only options are ignored"""
+    connection = Connection(path)
+    connection._connection.executescript(SCHEMA)
+    return connection
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+"""
+stats.py
+One-pass, mergeable statistics over a stream of numbers such as ages.
+
+Every accumulator here can be filled on its own shard of the data (in
+another process if need be, they pickle as plain attributes) and then
+merged, giving the same moments and histogram as a single pass and an
+approximate quantile sketch of the same accuracy.
+"""
+import math
+from functools import reduce
+
+
+class Moments:
+    """Count, mean, variance, min and max via Welford's update"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = None
+        self.max = None
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+
+    def merge(self, other):
+        """Fold `other` into this accumulator (Chan et al. pairwise update)"""
+        if not other.count:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance, or None before any value is added"""
+        return self.m2 / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.m2 / self.count) if self.count else None
+
+
+class Histogram:
+    """Fixed-width buckets over [low, high) plus underflow and overflow counts"""
+
+    def __init__(self, low=0, high=120, buckets=24):
+        if high <= low or buckets < 1:
+            raise ValueError("histogram needs low < high and at least one bucket")
+        self.low = low
+        self.high = high
+        self.width = (high - low) / buckets
+        self.counts = [0] * buckets
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, x):
+        if x < self.low:
+            self.underflow += 1
+        elif x >= self.high:
+            self.overflow += 1
+        else:
+            index = min(int((x - self.low) / self.width), len(self.counts) - 1)
+            self.counts[index] += 1
+
+    def merge(self, other):
+        if (other.low, other.high, len(other.counts)) != (self.low, self.high, len(self.counts)):
+            raise ValueError("can only merge histograms with the same buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def buckets(self):
+        """List of (bucket_low, bucket_high, count)"""
+        return [
+            (self.low + i * self.width, self.low + (i + 1) * self.width, count)
+            for i, count in enumerate(self.counts)
+        ]
+
+
+class TDigest:
+    """
+    Merging t-digest for approximate quantiles.
+
+    Values are buffered and periodically merged into at most roughly
+    `compression` weighted centroids, kept small near the tails so
+    extreme quantiles stay accurate.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []  # Sorted (mean, weight) pairs
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._buffer = []
+
+    def add(self, x, weight=1):
+        self._buffer.append((x, weight))
+        self.count += weight
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        self._buffer.extend(other.centroids)
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+        self._compress()
+        return self
+
+    def _scale(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        merged = []
+        mean, weight = points[0]
+        seen = 0  # Weight of the centroids already closed
+        k_low = self._scale(0)
+        for x, w in points[1:]:
+            if self._scale((seen + weight + w) / self.count) - k_low <= 1:
+                weight += w
+                mean += (x - mean) * w / weight
+            else:
+                merged.append((mean, weight))
+                seen += weight
+                k_low = self._scale(seen / self.count)
+                mean, weight = x, w
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Estimate the q-th quantile (0 <= q <= 1), or None when empty"""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        self._compress()
+        if not self.centroids:
+            return None
+        target = q * self.count
+        # Each centroid sits at the middle of the weight it covers;
+        # interpolate between neighbours, and towards min/max at the ends.
+        previous_mean, previous_position = self.min, 0
+        seen = 0
+        for mean, weight in self.centroids:
+            position = seen + weight / 2
+            if target <= position:
+                if position == previous_position:
+                    return mean
+                fraction = (target - previous_position) / (position - previous_position)
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_mean, previous_position = mean, position
+            seen += weight
+        if self.count == previous_position:
+            return self.max
+        fraction = (target - previous_position) / (self.count - previous_position)
+        return previous_mean + fraction * (self.max - previous_mean)
+
+
+class StreamStats:
+    """
+    Moments, histogram and quantile sketch filled in one pass.
+
+    >>> shard_a, shard_b = StreamStats(), StreamStats()
+    >>> shard_a.update([20, 30]); shard_b.update([40])
+    >>> shard_a.merge(shard_b).mean
+    30.0
+    """
+
+    def __init__(self, low=0, high=120, buckets=24, compression=100):
+        self.moments = Moments()
+        self.histogram = Histogram(low, high, buckets)
+        self.digest = TDigest(compression)
+
+    def add(self, x):
+        self.moments.add(x)
+        self.histogram.add(x)
+        self.digest.add(x)
+
+    def update(self, values):
+        """Add every value from an iterable, e.g. stream_user_ages()"""
+        for x in values:
+            self.add(x)
+
+    def merge(self, other):
+        """Fold another shard's statistics into this one and return self"""
+        self.moments.merge(other.moments)
+        self.histogram.merge(other.histogram)
+        self.digest.merge(other.digest)
+        return self
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean if self.moments.count else None
+
+    def quantile(self, q):
+        return self.digest.quantile(q)
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """Plain dict of every statistic, ready to print or serialize"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'variance': self.moments.variance,
+            'stddev': self.moments.stddev,
+            'min': self.moments.min,
+            'max': self.moments.max,
+            'quantiles': {q: self.quantile(q) for q in quantiles},
+            'histogram': self.histogram.buckets(),
+            'underflow': self.histogram.underflow,
+            'overflow': self.histogram.overflow,
+        }
+
+
+def summarize(values, **options):
+    """Fill a StreamStats from one stream of values"""
+    result = StreamStats(**options)
+    result.update(values)
+    return result
+
+
+def merge_all(shards):
+    """Merge StreamStats computed on separate shards into one"""
+    return reduce(lambda merged, shard: merged.merge(shard), shards)
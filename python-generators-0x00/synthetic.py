@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+"""
+synthetic.py
+Seedable, vectorized synthetic users for fixtures and benchmarks.
+
+Users are generated with NumPy in columnar batches
+({'user_id', 'name', 'email', 'age'} -> array), so building millions of
+rows costs a handful of array operations per batch instead of several
+Python calls per row. The same seed always yields the same users.
+
+Usage: ./synthetic.py rows output.csv [seed]
+"""
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # Everything here needs numpy; callers check HAVE_NUMPY
+    np = None
+
+HAVE_NUMPY = np is not None
+DEFAULT_BATCH_SIZE = 100000
+MIN_AGE, MAX_AGE = 18, 90
+FIRST_NAMES = (
+    'Alice', 'Bola', 'Chen', 'Dara', 'Emeka', 'Fatima', 'Grace', 'Hiro',
+    'Ifeoma', 'Jon', 'Kwame', 'Lena', 'Musa', 'Nadia', 'Omar', 'Priya',
+)
+LAST_NAMES = (
+    'Adeyemi', 'Bauer', 'Cruz', 'Diallo', 'Evans', 'Fofana', 'Garcia',
+    'Hansen', 'Ito', 'Johnson', 'Kamau', 'Lopez', 'Mensah', 'Nguyen',
+)
+# (text start, text end, hex digit offset) of the five UUID digit groups
+UUID_GROUPS = ((0, 8, 0), (9, 13, 8), (14, 18, 12), (19, 23, 16), (24, 36, 20))
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("synthetic data generation needs numpy installed")
+
+
+def uuid4_strings(rng, n):
+    """n random version-4 UUID strings, built without a per-row loop"""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # Version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    digits = np.frombuffer(raw.tobytes().hex().encode('ascii'), dtype=np.uint8)
+    digits = digits.reshape(n, 32)
+    text = np.full((n, 36), ord('-'), dtype=np.uint8)
+    for start, end, offset in UUID_GROUPS:
+        text[:, start:end] = digits[:, offset:offset + end - start]
+    return text.view('S36').ravel().astype('U36')
+
+
+def ages(rng, n):
+    """n ages drawn uniformly from MIN_AGE..MAX_AGE"""
+    return rng.integers(MIN_AGE, MAX_AGE + 1, size=n)
+
+
+def name_table():
+    """Every first/last name pair and its email local part, built once"""
+    first = np.array(FIRST_NAMES)[:, None]
+    last = np.array(LAST_NAMES)[None, :]
+    names = np.char.add(np.char.add(first, ' '), last).ravel()
+    locals_ = np.char.add(np.char.add(np.char.lower(first), '.'), np.char.lower(last)).ravel()
+    return names, locals_
+
+
+def make_batch(rng, n, start=0, names=None):
+    """One columnar batch of n users; `start` numbers their emails"""
+    names, locals_ = names or name_table()
+    picks = rng.integers(0, len(names), size=n)
+    numbers = np.arange(start, start + n).astype(str)
+    return {
+        'user_id': uuid4_strings(rng, n),
+        'name': names[picks],
+        'email': np.char.add(np.char.add(locals_[picks], numbers), '@example.com'),
+        'age': ages(rng, n),
+    }
+
+
+def user_batches(count, batch_size=DEFAULT_BATCH_SIZE, seed=None):
+    """Generator that yields columnar batches totalling `count` users"""
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    names = name_table()
+    for start in range(0, count, batch_size):
+        yield make_batch(rng, min(batch_size, count - start), start, names)
+
+
+def batch_rows(batch):
+    """Turn a columnar batch into (user_id, name, email, age) tuples"""
+    return list(zip(batch['user_id'].tolist(), batch['name'].tolist(),
+                    batch['email'].tolist(), batch['age'].tolist()))
+
+
+def age_chunks(count, chunk_size=DEFAULT_BATCH_SIZE, seed=None):
+    """Generator that yields arrays of ages totalling `count`"""
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk_size):
+        yield ages(rng, min(chunk_size, count - start))
+
+
+def write_csv(path, count, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Write `count` users to a user_id,name,email,age CSV"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('user_id,name,email,age\n')
+        for batch in user_batches(count, batch_size, seed):
+            columns = (batch['user_id'], batch['name'], batch['email'], batch['age'].astype(str))
+            f.write('\n'.join(map(','.join, zip(*(c.tolist() for c in columns)))))
+            f.write('\n')
+
+
+def insert_users(connection, count, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert `count` synthetic users through seed.insert_batches"""
+    seed_module = __import__('seed')
+    batches = (batch_rows(b) for b in user_batches(count, batch_size, seed))
+    return seed_module.insert_batches(connection, batches)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: ./synthetic.py rows output.csv [seed]")
+        sys.exit(1)
+    write_csv(sys.argv[2], int(sys.argv[1]), int(sys.argv[3]) if len(sys.argv) > 3 else None)